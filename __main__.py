@@ -1,18 +1,16 @@
 from lstore.db import Database
 from lstore.query import Query
 from time import process_time
-from random import choice, randrange
+from random import choices, randrange
 
 # Student Id and 4 grades
 db = Database()
 grades_table = db.create_table('Grades', 5, 0)
 query = Query(grades_table)
-keys = []
+keys = list(range(906659671, 906659671 + 10000))
 
 insert_time_0 = process_time()
-for i in range(0, 10000):
-    query.insert(906659671 + i, 93, 0, 0, 0)
-    keys.append(906659671 + i)
+query.insert_many([(key, 93, 0, 0, 0) for key in keys])
 insert_time_1 = process_time()
 
 print("Inserting 10k records took:  \t\t\t", insert_time_1 - insert_time_0)
@@ -26,16 +24,23 @@ update_cols = [
     [None, None, None, None, randrange(0, 100)],
 ]
 
+update_keys = choices(keys, k=10000)
+update_values = choices(update_cols, k=10000)
+update = query.update
+
 update_time_0 = process_time()
-for i in range(0, 10000):
-    query.update(choice(keys), *(choice(update_cols)))
+for key, columns in zip(update_keys, update_values):
+    update(key, *columns)
 update_time_1 = process_time()
 print("Updating 10k records took:  \t\t\t", update_time_1 - update_time_0)
 
 # Measuring Select Performance
+select_keys = choices(keys, k=10000)
+select = query.select
+
 select_time_0 = process_time()
-for i in range(0, 10000):
-    query.select(choice(keys),0 , [1, 1, 1, 1, 1])
+for key in select_keys:
+    select(key, 0, [1, 1, 1, 1, 1])
 select_time_1 = process_time()
 print("Selecting 10k records took:  \t\t\t", select_time_1 - select_time_0)
 
@@ -3,7 +3,8 @@ from lstore.query import Query
 from lstore.transaction import Transaction
 from lstore.transaction_worker import TransactionWorker
 
-from random import choice, randint, sample, seed
+from queue import SimpleQueue
+from random import choice, choices, sample, seed
 
 db = Database()
 db.open('./CS451')
@@ -14,8 +15,8 @@ grades_table = db.create_table('Grades', 5, 0)
 # create a query class for the grades table
 query = Query(grades_table)
 
-# dictionary for records to test the database: test directory
-records = {}
+# list of records to test the database: test directory, row i holds keys[i]
+records = []
 
 number_of_records = 1000
 number_of_transactions = 100
@@ -30,7 +31,7 @@ except Exception as e:
     print('Index API not implemented properly, tests may fail.')
 
 keys = []
-records = {}
+records = []
 seed(3562901)
 
 # array of insert transactions
@@ -42,16 +43,18 @@ for i in range(number_of_transactions):
 for i in range(0, number_of_records):
     key = 92106429 + i
     keys.append(key)
-    records[key] = [key, randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20)]
+    records.append([key, *choices(range(i * 20, (i + 1) * 20 + 1), k=4)])
     t = insert_transactions[i % number_of_transactions]
-    t.add_query(query.insert, grades_table, *records[key])
+    t.add_query(query.insert, grades_table, *records[i])
+
+# workers pull from one shared queue so none of them is left with a long tail
+transaction_queue = SimpleQueue()
+for i in range(number_of_transactions):
+    transaction_queue.put(insert_transactions[i])
 
 transaction_workers = []
 for i in range(num_threads):
-    transaction_workers.append(TransactionWorker())
-    
-for i in range(number_of_transactions):
-    transaction_workers[i % num_threads].add_transaction(insert_transactions[i])
+    transaction_workers.append(TransactionWorker(transaction_queue=transaction_queue))
 
 
 
@@ -65,14 +68,10 @@ for i in range(num_threads):
 
 
 # Check inserted records using select query in the main thread outside workers
-for key in keys:
+for key, correct in zip(keys, records):
     record = query.select(key, 0, [1, 1, 1, 1, 1])[0]
-    error = False
-    for i, column in enumerate(record.columns):
-        if column != records[key][i]:
-            error = True
-    if error:
-        print('select error on', key, ':', record, ', correct:', records[key])
+    if record.columns != correct:
+        print('select error on', key, ':', record, ', correct:', correct)
     else:
         pass
         # print('select on', key, ':', record)
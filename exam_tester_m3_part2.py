@@ -3,7 +3,8 @@ from lstore.query import Query
 from lstore.transaction import Transaction
 from lstore.transaction_worker import TransactionWorker
 
-from random import choice, randint, sample, seed
+from queue import SimpleQueue
+from random import choice, choices, sample, seed
 
 db = Database()
 db.open('./CS451')
@@ -14,8 +15,8 @@ grades_table = db.get_table('Grades')
 # create a query class for the grades table
 query = Query(grades_table)
 
-# dictionary for records to test the database: test directory
-records = {}
+# list of records to test the database: test directory, row i holds keys[i]
+records = []
 
 number_of_records = 1000
 number_of_transactions = 100
@@ -23,15 +24,14 @@ number_of_operations_per_record = 1
 num_threads = 8
 
 keys = []
-records = {}
+records = []
 seed(3562901)
 
 # re-generate records for testing
 for i in range(0, number_of_records):
     key = 92106429 + i
     keys.append(key)
-    records[key] = [key, randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20), randint(i * 20, (i + 1) * 20)]
-    print(records[key])
+    records.append([key, *choices(range(i * 20, (i + 1) * 20 + 1), k=4)])
 
 transaction_workers = []
 transactions = []
@@ -39,32 +39,34 @@ transactions = []
 for i in range(number_of_transactions):
     transactions.append(Transaction())
 
+# workers pull from one shared queue so none of them is left with a long tail
+transaction_queue = SimpleQueue()
 for i in range(num_threads):
-    transaction_workers.append(TransactionWorker())
+    transaction_workers.append(TransactionWorker(transaction_queue=transaction_queue))
 
 
 
 
-updated_records = {}
+updated_records = [None] * number_of_records
 # x update on every column
 for j in range(number_of_operations_per_record):
-    for key in keys:
+    for position, key in enumerate(keys):
         updated_columns = [None, None, None, None, None]
-        updated_records[key] = records[key].copy()
-        for i in range(2, grades_table.num_columns):
+        updated_records[position] = records[position].copy()
+        new_values = choices(range(0, 21), k=grades_table.num_columns - 2)
+        for i, value in enumerate(new_values, start=2):
             # updated value
-            value = randint(0, 20)
             updated_columns[i] = value
             # update our test directory
-            updated_records[key][i] = value
+            updated_records[position][i] = value
         transactions[key % number_of_transactions].add_query(query.select, grades_table, key, 0, [1, 1, 1, 1, 1])
         transactions[key % number_of_transactions].add_query(query.update, grades_table, key, *updated_columns)
 print("Update finished")
 
 
-# add trasactions to transaction workers  
+# add trasactions to the shared queue
 for i in range(number_of_transactions):
-    transaction_workers[i % num_threads].add_transaction(transactions[i])
+    transaction_queue.put(transactions[i])
 
 
 
@@ -77,55 +79,45 @@ for i in range(num_threads):
     transaction_workers[i].join()
 
 
-score = len(keys)
-for key in keys:
-    correct = records[key]
-    query = Query(grades_table)
-    
-    result = query.select_version(key, 0, [1, 1, 1, 1, 1], -1)[0].columns
-    if correct != result:
-        print('select error on primary key', key, ':', result, ', correct:', correct)
-        score -= 1
-print('Version -1 Score:', score, '/', len(keys))
+# check all three versions of each key in one pass, sharing the lookup of its base record
+version_checks = ((-1, records), (-2, records), (0, updated_records))
+version_scores = {version: len(keys) for version, _ in version_checks}
+for position, key in enumerate(keys):
+    results = query.select_versions(key, 0, [1, 1, 1, 1, 1], [version for version, _ in version_checks])
+    for (version, expected), result in zip(version_checks, results):
+        correct = expected[position]
+        if correct != result.columns:
+            print('select error on primary key', key, ':', result.columns, ', correct:', correct)
+            version_scores[version] -= 1
 
-v2_score = len(keys)
-for key in keys:
-    correct = records[key]
-    query = Query(grades_table)
-    
-    result = query.select_version(key, 0, [1, 1, 1, 1, 1], -2)[0].columns
-    if correct != result:
-        print('select error on primary key', key, ':', result, ', correct:', correct)
-        v2_score -= 1
+score = version_scores[-1]
+v2_score = version_scores[-2]
+print('Version -1 Score:', score, '/', len(keys))
 print('Version -2 Score:', v2_score, '/', len(keys))
 if score != v2_score:
     print('Failure: Version -1 and Version -2 scores must be same')
 
-score = len(keys)
-for key in keys:
-    correct = updated_records[key]
-    query = Query(grades_table)
-    
-    result = query.select_version(key, 0, [1, 1, 1, 1, 1], 0)[0].columns
-    if correct != result:
-        print('select error on primary key', key, ':', result, ', correct:', correct)
-        score -= 1
+score = version_scores[0]
 print('Version 0 Score:', score, '/', len(keys))
 
 number_of_aggregates = 100
+key_positions = range(0, len(keys))
+
+def random_ranges():
+    # draw every (start, end) position pair for one aggregate block up front
+    return [sorted(sample(key_positions, 2)) for _ in range(number_of_aggregates)]
+
 valid_sums = 0
-for i in range(0, number_of_aggregates):
-    r = sorted(sample(range(0, len(keys)), 2))
-    column_sum = sum(map(lambda x: records[x][0] if x in records else 0, keys[r[0]: r[1] + 1]))
+for r in random_ranges():
+    column_sum = sum(row[0] for row in records[r[0]: r[1] + 1])
     result = query.sum_version(keys[r[0]], keys[r[1]], 0, -1)
     if column_sum == result:
         valid_sums += 1
 print("Aggregate version -1 finished. Valid Aggregations: ", valid_sums, '/', number_of_aggregates)
 
 v2_valid_sums = 0
-for i in range(0, number_of_aggregates):
-    r = sorted(sample(range(0, len(keys)), 2))
-    column_sum = sum(map(lambda x: records[x][0] if x in records else 0, keys[r[0]: r[1] + 1]))
+for r in random_ranges():
+    column_sum = sum(row[0] for row in records[r[0]: r[1] + 1])
     result = query.sum_version(keys[r[0]], keys[r[1]], 0, -2)
     if column_sum == result:
         v2_valid_sums += 1
@@ -134,9 +126,8 @@ if valid_sums != v2_valid_sums:
     print('Failure: Version -1 and Version -2 aggregation scores must be same.')
 
 valid_sums = 0
-for i in range(0, number_of_aggregates):
-    r = sorted(sample(range(0, len(keys)), 2))
-    column_sum = sum(map(lambda x: updated_records[x][0] if x in updated_records else 0, keys[r[0]: r[1] + 1]))
+for r in random_ranges():
+    column_sum = sum(row[0] for row in updated_records[r[0]: r[1] + 1])
     result = query.sum_version(keys[r[0]], keys[r[1]], 0, 0)
     if column_sum == result:
         valid_sums += 1
@@ -4,21 +4,138 @@ Bufferpool Management System
 The bufferpool is a memory management layer that sits between the database and disk storage.
 It maintains a fixed-size pool of pages in memory to optimize database performance by:
 1. Keeping frequently accessed pages in memory
-2. Managing page eviction using LRU (Least Recently Used) policy
+2. Managing page eviction using CLOCK (second-chance), an approximation of LRU
 3. Handling dirty page tracking and disk writes
 4. Providing pin/unpin mechanisms to protect active pages
 """
 
 from lstore.page import Page
+import threading
+import mmap
 import os
 import json
 
+PAGE_SIZE = 4096
+HEAP_GROWTH = 256 * PAGE_SIZE  # Heap files grow 1MB at a time
+
+class HeapFile:
+    """
+    Stores every page of one table in a single file, memory-mapped so page loads
+    and flushes are plain memory copies. Pages are numbered in the order they are
+    first written; the page_id -> page number map is saved next to the heap when
+    it is closed. Pages left in the older one-file-per-page layout
+    (<page_id>.db) are moved into the heap when it is opened.
+    """
+    def __init__(self, directory):
+        self.path = f"{directory}/pages.heap"
+        self.map_path = f"{directory}/pages.json"
+        self.page_numbers = {}  # {page_id: page number within the heap}
+        self._map_dirty = False  # Pages were added since the map was last saved
+        self._lock = threading.Lock()
+        
+        if os.path.exists(self.map_path):
+            with open(self.map_path, 'r') as f:
+                self.page_numbers = json.load(f)
+                
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        self._mmap = mmap.mmap(self._fd, size) if size else None  # Can't map an empty file
+        self._migrate_page_files(directory)
+        
+    def _migrate_page_files(self, directory):
+        """Copies pages stored as separate <page_id>.db files into the heap, then removes the files"""
+        page_files = [name for name in os.listdir(directory) if name.endswith('.db')]
+        if not page_files:
+            return
+        for name in page_files:
+            page_id = name[:-len('.db')]
+            if page_id in self.page_numbers:
+                continue  # Already migrated; the file outlived an interrupted clean-up
+            with open(f"{directory}/{name}", 'rb') as f:
+                self.write_page(page_id, f.read(PAGE_SIZE))
+        # The files are only removed once the heap and its map are safely on disk
+        self._mmap.flush()
+        self._save_map()
+        for name in page_files:
+            os.remove(f"{directory}/{name}")
+        
+    def read_page(self, page_id, buffer):
+        """Copies the page's bytes into buffer and returns it, or returns None if it was never written"""
+        with self._lock:
+            page_number = self.page_numbers.get(page_id)
+            if page_number is None:
+                return None
+            offset = page_number * PAGE_SIZE
+            # Copy straight out of the mapping; the view is released before the heap can be resized
+            with memoryview(self._mmap) as view:
+                buffer[:] = view[offset:offset + PAGE_SIZE]
+            return buffer
+            
+    def write_page(self, page_id, data):
+        """Copies the page's bytes into the heap, appending a new page on first write"""
+        with self._lock:
+            page_number = self.page_numbers.get(page_id)
+            if page_number is None:
+                page_number = len(self.page_numbers)
+                self.page_numbers[page_id] = page_number
+                self._map_dirty = True
+                
+            offset = page_number * PAGE_SIZE
+            if self._mmap is None or offset + PAGE_SIZE > len(self._mmap):
+                self._grow(offset + PAGE_SIZE)
+            self._mmap[offset:offset + len(data)] = data
+            
+    def _grow(self, min_size):
+        """Extends the file in HEAP_GROWTH steps and remaps it"""
+        new_size = -(-min_size // HEAP_GROWTH) * HEAP_GROWTH
+        if self._mmap is not None:
+            self._mmap.close()
+        os.ftruncate(self._fd, new_size)
+        self._mmap = mmap.mmap(self._fd, new_size)
+        
+    def close(self):
+        """Flushes the mapping and page map to disk and releases the file"""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+                self._mmap.close()
+                self._mmap = None
+            os.close(self._fd)
+            if self._map_dirty:
+                self._save_map()
+            
+    def _save_map(self):
+        """Writes the page map next to the heap, replacing the old one in a single rename"""
+        temp_path = f"{self.map_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.page_numbers, f)
+        os.replace(temp_path, self.map_path)
+        self._map_dirty = False
+
+class PageEntry:
+    """A page held in the pool, with where it lives on disk, its pin count, dirty flag and CLOCK reference bit"""
+    __slots__ = ('page', 'table_name', 'page_id', 'pin_count', 'is_dirty', 'referenced')
+    
+    def __init__(self, page, table_name, page_id, pin_count=0, is_dirty=False):
+        self.page = page
+        self.table_name = table_name
+        self.page_id = page_id
+        self.pin_count = pin_count
+        self.is_dirty = is_dirty
+        self.referenced = True
+
 class Bufferpool:
     def __init__(self, pool_size):
         self.pool_size = pool_size
-        self.pool = {}
-        self.lru = []
+        self.pool = {}  # {pool_key: PageEntry}
+        self._clock = []  # Pool keys in CLOCK order
+        self._hand = 0  # Next clock position considered for eviction
         self.page_directory = {}
+        self._pool_keys = {}  # {(table_name, page_id): pool_key}, so each key string is built once
+        self._known_dirs = set()  # Data directories already created on disk
+        self._heaps = {}  # {table_name: HeapFile}, opened on first use
+        self._heaps_lock = threading.Lock()
+        self.evictions = 0  # Bumped on every eviction, so holders of page references know to drop them
         self.debug = False
         
         # Load page directory from metadata
@@ -27,7 +144,9 @@ class Bufferpool:
                 metadata = json.loads(f.read())
                 if 'page_directory' in metadata:
                     self._debug_log(f"Loading page directory from metadata")
-                    self.page_directory = metadata['page_directory']
+                    # JSON object keys are strings and tuples come back as lists; convert both once at load
+                    page_directory = metadata['page_directory']
+                    self.page_directory = dict(zip(map(int, page_directory), map(tuple, page_directory.values())))
                     self._debug_log(f"Loaded {len(self.page_directory)} page directory entries")
         except Exception as e:
             self._debug_log(f"Failed to load page directory: {str(e)}")
@@ -36,42 +155,52 @@ class Bufferpool:
         if self.debug:
             print(f"BUFFERPOOL: {message}")
         
+    def _pool_key(self, table_name, page_id):
+        """Returns the shared pool key string for a page, building it on first use"""
+        pool_key = self._pool_keys.get((table_name, page_id))
+        if pool_key is None:
+            pool_key = self._pool_keys.setdefault((table_name, page_id), f"{table_name}_{page_id}")
+        return pool_key
+        
     def get_page(self, table_name, page_id):
         """
         Retrieves a page from bufferpool or disk if necessary
         """
-        self._debug_log(f"\n=== GET PAGE START for {table_name}/{page_id} ===")
-        pool_key = f"{table_name}_{page_id}"
+        if self.debug:
+            self._debug_log(f"\n=== GET PAGE START for {table_name}/{page_id} ===")
+        pool_key = self._pool_key(table_name, page_id)
         
         # Check if in memory
-        if pool_key in self.pool:
-            self._debug_log(f"Found page in pool")
-            self.lru.remove(pool_key)
-            self.lru.append(pool_key)
-            page, pin_count, is_dirty = self.pool[pool_key]
-            self.pool[pool_key] = (page, pin_count + 1, is_dirty)
-            return page
+        entry = self.pool.get(pool_key)
+        if entry is not None:
+            if self.debug:
+                self._debug_log(f"Found page in pool")
+            # A hit only sets the reference bit; nothing is reordered
+            entry.referenced = True
+            entry.pin_count += 1
+            return entry.page
             
         # Load from disk
-        self._debug_log(f"Page not in pool, loading from disk")
+        if self.debug:
+            self._debug_log(f"Page not in pool, loading from disk")
         page = self._load_page_from_disk(table_name, page_id)
         
         # Add to pool
         if len(self.pool) >= self.pool_size:
-            self._debug_log(f"Pool full, evicting page")
+            if self.debug:
+                self._debug_log(f"Pool full, evicting page")
             self._evict_page()
             
-        self.pool[pool_key] = (page, 1, False)
-        self.lru.append(pool_key)
+        self._add_to_pool(pool_key, PageEntry(page, table_name, page_id, pin_count=1))
         
         return page
         
-    def _extract_page_info(self, pool_key):
-        """Safely extracts table name and page id from pool key"""
-        parts = pool_key.split('_', 1)  # Split on first underscore only
-        if len(parts) != 2:
-            raise ValueError(f"Invalid pool key format: {pool_key}")
-        return parts[0], parts[1]
+    def _add_to_pool(self, pool_key, entry):
+        """Adds an entry just behind the clock hand, so it is the last page the next sweep reaches"""
+        if pool_key not in self.pool:
+            self._clock.insert(self._hand, pool_key)
+            self._hand += 1
+        self.pool[pool_key] = entry
         
     def write_to_page(self, table_name, page_id, value, index=None):
         """
@@ -83,6 +212,17 @@ class Bufferpool:
             self.mark_dirty(table_name, page_id)
         return success
         
+    def write_row(self, table_name, page_ids, values, index=None):
+        """
+        Writes one value to each of the given pages (a record's column pages) and marks
+        them dirty, fetching each page once. Stops at the first failed write.
+        """
+        for page_id, value in zip(page_ids, values):
+            if not self.get_page(table_name, page_id).write(value, index):
+                return False
+            self.mark_dirty(table_name, page_id)
+        return True
+        
     def read_from_page(self, table_name, page_id, index):
         """
         Reads a value from a page
@@ -91,92 +231,113 @@ class Bufferpool:
         return page.read(index)
         
     def unpin_page(self, table_name, page_id):
-        pool_key = f"{table_name}_{page_id}"
-        if pool_key in self.pool:
-            page, pin_count, is_dirty = self.pool[pool_key]
-            if pin_count > 0:
-                self.pool[pool_key] = (page, pin_count - 1, is_dirty)
+        pool_key = self._pool_key(table_name, page_id)
+        entry = self.pool.get(pool_key)
+        if entry is not None and entry.pin_count > 0:
+            entry.pin_count -= 1
                 
     def mark_dirty(self, table_name, page_id):
-        pool_key = f"{table_name}_{page_id}"
-        if pool_key in self.pool:
-            page, pin_count, _ = self.pool[pool_key]
-            self.pool[pool_key] = (page, pin_count, True)
+        pool_key = self._pool_key(table_name, page_id)
+        entry = self.pool.get(pool_key)
+        if entry is not None:
+            entry.is_dirty = True
             
     def _evict_page(self):
         """
-        Evicts the least recently used unpinned page
-        """
-        for pool_key in self.lru:
-            page, pin_count, is_dirty = self.pool[pool_key]
-            if pin_count == 0:  # Only evict unpinned pages
-                if is_dirty:
-                    try:
-                        table_name, page_id = self._extract_page_info(pool_key)
-                        self._write_page_to_disk(table_name, page_id, page)
-                    except ValueError:
-                        continue
-                del self.pool[pool_key]
-                self.lru.remove(pool_key)
-                return
+        Evicts an unpinned page using CLOCK: the hand sweeps the pool, giving each
+        recently referenced page a second chance by clearing its bit, and evicts
+        the first unpinned page whose bit is already clear
+        """
+        # Two full sweeps are enough to clear every bit once and revisit each page
+        for _ in range(2 * len(self._clock)):
+            if self._hand >= len(self._clock):
+                self._hand = 0
+            pool_key = self._clock[self._hand]
+            entry = self.pool[pool_key]
+            
+            if entry.pin_count == 0:  # Only evict unpinned pages
+                if entry.referenced:
+                    entry.referenced = False
+                else:
+                    if entry.is_dirty:
+                        self._write_page_to_disk(entry.table_name, entry.page_id, entry.page)
+                    del self.pool[pool_key]
+                    self.evictions += 1
+                    self._clock.pop(self._hand)  # Hand now points at the next page
+                    return
+                        
+            self._hand += 1
                 
     def _load_page_from_disk(self, table_name, page_id):
-        """Loads a page from disk. Returns a new page if file doesn't exist."""
-        self._debug_log(f"\n=== LOAD PAGE FROM DISK ===")
-        directory = f"data/{table_name}"
-        filepath = f"{directory}/{page_id}.db"
-        
-        self._debug_log(f"Looking for file: {filepath}")
-        self._debug_log(f"Directory exists: {os.path.exists(directory)}")
+        """Loads a page from the table's heap file. Returns a new page if it was never written."""
+        if self.debug:
+            self._debug_log(f"\n=== LOAD PAGE FROM DISK ===")
         
-        if not os.path.exists(filepath):
-            self._debug_log(f"File not found: {filepath}")
-            return Page()
-            
         try:
-            with open(filepath, 'rb') as f:
-                page = Page()
-                data = f.read()
-                self._debug_log(f"Read {len(data)} bytes")
-                page.data = bytearray(data)
-                
-                # Set number of records based on page size
-                page.num_records = len(data) // 8  # Assuming 8-byte records
+            data = self._heap(table_name).read_page(page_id, bytearray(PAGE_SIZE))
+            if data is None:
+                if self.debug:
+                    self._debug_log(f"Page not found in heap: {table_name}/{page_id}")
+                return Page()
                 
+            page = Page(data)
+            if self.debug:
+                self._debug_log(f"Read {len(data)} bytes")
+            
+            # Set number of records based on page size
+            page.num_records = len(data) // 8  # Assuming 8-byte records
+            
+            if self.debug:
                 self._debug_log(f"Raw data preview: {page.data[:32].hex()}")  # Show first few bytes in hex
                 self._debug_log(f"Loaded page with {page.num_records} records")
-                return page
+            return page
                 
         except Exception as e:
-            self._debug_log(f"Error loading page: {str(e)}")
-            import traceback
-            self._debug_log(f"Traceback: {traceback.format_exc()}")
+            if self.debug:
+                self._debug_log(f"Error loading page: {str(e)}")
+                import traceback
+                self._debug_log(f"Traceback: {traceback.format_exc()}")
             return Page()
             
+    def _ensure_directory(self, table_name):
+        """Returns the table's data directory, creating it the first time it is needed"""
+        directory = f"data/{table_name}"
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+        return directory
+        
+    def _heap(self, table_name):
+        """Returns the table's heap file, opening it on first use"""
+        heap = self._heaps.get(table_name)
+        if heap is None:
+            with self._heaps_lock:
+                heap = self._heaps.get(table_name)
+                if heap is None:
+                    heap = HeapFile(self._ensure_directory(table_name))
+                    self._heaps[table_name] = heap
+        return heap
+        
     def _write_page_to_disk(self, table_name, page_id, page):
         """
-        Writes a page to disk, creating directories if needed
+        Writes a page into the table's heap file
         """
-        directory = f"data/{table_name}"
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-            
-        filepath = f"{directory}/{page_id}.db"
-        with open(filepath, 'wb') as f:
-            f.write(page.data)
+        self._heap(table_name).write_page(page_id, page.data)
             
     def close(self):
         """
-        Flushes all dirty pages to disk
+        Flushes all dirty pages to disk. Pages are copied into their table's mapped
+        heap file, then each heap is flushed once.
         """
-        for pool_key in list(self.pool.keys()):
-            page, pin_count, is_dirty = self.pool[pool_key]
-            if is_dirty:
-                try:
-                    table_name, page_id = self._extract_page_info(pool_key)
-                    self._write_page_to_disk(table_name, page_id, page)
-                except ValueError:
-                    continue
+        # Writing back doesn't add or remove entries, so iterate the pool directly
+        for entry in self.pool.values():
+            if entry.is_dirty:
+                self._write_page_to_disk(entry.table_name, entry.page_id, entry.page)
+                    
+        with self._heaps_lock:
+            for heap in self._heaps.values():
+                heap.close()
+            self._heaps.clear()
                     
     def get_num_records(self, table_name, page_id):
         """
@@ -186,47 +347,54 @@ class Bufferpool:
         return page.num_records
         
     def get_record(self, rid):
-        self._debug_log(f"\n=== GET RECORD START for RID {rid} ===")
+        if self.debug:
+            self._debug_log(f"\n=== GET RECORD START for RID {rid} ===")
         
         try:
             # Get page info from directory
-            if str(rid) not in self.page_directory:
-                self._debug_log(f"RID {rid} not found in directory")
+            page_info = self.page_directory.get(rid)
+            if page_info is None:
+                if self.debug:
+                    self._debug_log(f"RID {rid} not found in directory")
                 return None
             
-            page_info = self.page_directory[str(rid)]
-            self._debug_log(f"Page directory entry for RID {rid}: {page_info}")
+            if self.debug:
+                self._debug_log(f"Page directory entry for RID {rid}: {page_info}")
             
             # Get specific page
             page_type, page_index, slot = page_info
             page_id = f"base_{page_type}_{page_index}"  # Changed format to match logs
             
-            self._debug_log(f"Looking for specific page: {page_id}")
+            if self.debug:
+                self._debug_log(f"Looking for specific page: {page_id}")
             page = self.get_page("Grades", page_id)
             
             if not page:
-                self._debug_log(f"Failed to get page {page_id}")
+                if self.debug:
+                    self._debug_log(f"Failed to get page {page_id}")
                 return None
             
             # Try to read record
-            self._debug_log(f"Reading from slot {slot} in page {page_id}")
-            self._debug_log(f"Page data size: {len(page.data)}, num_records: {page.num_records}")
+            if self.debug:
+                self._debug_log(f"Reading from slot {slot} in page {page_id}")
+                self._debug_log(f"Page data size: {len(page.data)}, num_records: {page.num_records}")
             
             value = page.read(slot)
-            self._debug_log(f"Read result: {value}")
+            if self.debug:
+                self._debug_log(f"Read result: {value}")
             
             return value
             
         except Exception as e:
-            self._debug_log(f"Error in get_record: {str(e)}")
-            import traceback
-            self._debug_log(f"Traceback: {traceback.format_exc()}")
+            if self.debug:
+                self._debug_log(f"Error in get_record: {str(e)}")
+                import traceback
+                self._debug_log(f"Traceback: {traceback.format_exc()}")
             return None
 
     def load_page_from_disk(self, page_id):
         """Load a page from disk into the bufferpool"""
         table_name = page_id.split('_')[0]  # Extract table name from page_id
         page = self._load_page_from_disk(table_name, page_id)
-        self.pool[page_id] = (page, 1, False)  # pin_count=1, is_dirty=False
-        self.lru.append(page_id)
+        self._add_to_pool(page_id, PageEntry(page, table_name, page_id, pin_count=1))
         self._debug_log(f"Page {page_id} loaded into bufferpool")
\ No newline at end of file
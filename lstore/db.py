@@ -19,6 +19,28 @@ from lstore.transaction_exceptions import *
 import os
 import json
 
+try:
+    import orjson  # Optional: much faster metadata load/save when installed
+except ImportError:
+    orjson = None
+
+def _read_metadata(path):
+    """Loads a metadata file, using orjson when it is available"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _write_metadata(path, metadata):
+    """Saves a metadata file, using orjson when it is available. Integer keys are written as strings."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(metadata, option=orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, 'w') as f:
+            json.dump(metadata, f)
+
 class Database:
     def __init__(self):
         self.tables = {}
@@ -40,35 +62,33 @@ class Database:
         try:
             metadata_path = os.path.join(path, 'metadata.json')
             if os.path.exists(metadata_path):
-                with open(metadata_path, 'r') as f:
-                    metadata = json.load(f)
-                    #print(f"DEBUG: Loaded metadata for tables: {list(metadata.keys())}")
+                metadata = _read_metadata(metadata_path)
+                #print(f"DEBUG: Loaded metadata for tables: {list(metadata.keys())}")
+                
+                for table_name, table_info in metadata.items():
+                    #print(f"DEBUG: Loading table {table_name}")
+                    table_metadata_path = os.path.join(path, f"{table_name}_metadata.json")
                     
-                    for table_name, table_info in metadata.items():
-                        #print(f"DEBUG: Loading table {table_name}")
-                        table_metadata_path = os.path.join(path, f"{table_name}_metadata.json")
+                    if os.path.exists(table_metadata_path):
+                        table_metadata = _read_metadata(table_metadata_path)
+                        
+                        table = Table.from_metadata(
+                            name=table_name,
+                            num_columns=table_info['num_columns'],
+                            key=table_info['key'],
+                            bufferpool=self.bufferpool,
+                            metadata=table_metadata,
+                            lock_manager=self.lock_manager
+                        )
+                        
+                        # print(f"DEBUG: Table {table_name} loaded - attributes check:")
+                        # print(f"  - bufferpool: {table.bufferpool is not None}")
+                        # print(f"  - lock_manager: {table.lock_manager is not None}")
+                        # print(f"  - num_columns: {table.num_columns}")
+                        # print(f"  - num_records: {table.num_records}")
+                        
+                        self.tables[table_name] = table
                         
-                        if os.path.exists(table_metadata_path):
-                            with open(table_metadata_path, 'r') as tf:
-                                table_metadata = json.load(tf)
-                                
-                                table = Table.from_metadata(
-                                    name=table_name,
-                                    num_columns=table_info['num_columns'],
-                                    key=table_info['key'],
-                                    bufferpool=self.bufferpool,
-                                    metadata=table_metadata,
-                                    lock_manager=self.lock_manager
-                                )
-                                
-                                # print(f"DEBUG: Table {table_name} loaded - attributes check:")
-                                # print(f"  - bufferpool: {table.bufferpool is not None}")
-                                # print(f"  - lock_manager: {table.lock_manager is not None}")
-                                # print(f"  - num_columns: {table.num_columns}")
-                                # print(f"  - num_records: {table.num_records}")
-                                
-                                self.tables[table_name] = table
-                                
                 #print(f"Database loaded from {path}.")
                 
         except Exception as e:
@@ -102,26 +122,21 @@ class Database:
                 
                 # Save individual table metadata
                 table_metadata = {
-                    'page_directory': {str(k): list(v) for k, v in table.page_directory.items()},
+                    'page_directory': table.page_directory.to_metadata(),
                     'num_records': table.num_records,
                     'num_updates': table.num_updates,
                     'base_page_ids': table.base_page_ids,
                     'tail_page_ids': table.tail_page_ids,
-                    'index_data': {
-                        str(i): {str(k): v for k, v in (index_dict or {}).items()}
-                        for i, index_dict in enumerate(table.index.indices)
-                        if index_dict is not None
-                    }
+                    # Index dicts are written as they are rather than copied with str() keys
+                    'index_data': table.index.to_metadata()
                 }
                 
                 table_metadata_path = os.path.join(path, f"{table_name}_metadata.json")
-                with open(table_metadata_path, 'w') as f:
-                    json.dump(table_metadata, f)
+                _write_metadata(table_metadata_path, table_metadata)
 
             # Save main metadata file
             metadata_path = os.path.join(path, 'metadata.json')
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f)
+            _write_metadata(metadata_path, metadata)
                 
             # Flush bufferpool
             self.bufferpool.close()
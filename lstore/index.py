@@ -1,4 +1,57 @@
 import threading
+from bisect import bisect_left, bisect_right
+
+class ColumnIndex(dict):
+    """
+    One column's {value: rid} map. Lookups are plain dict lookups; the sorted list of
+    values used for range scans is built on demand and kept until the map next changes.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0  # Bumped on every change
+        self._sorted_keys = (-1, [])  # (version it was built at, sorted values)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def sorted_keys(self):
+        """Returns every value in sorted order, sorting again only after a change"""
+        version, keys = self._sorted_keys
+        if version != self.version:
+            version = self.version
+            keys = sorted(self)
+            self._sorted_keys = (version, keys)
+        return keys
+
+    def keys_in_range(self, begin, end):
+        """Returns the values in [begin, end] in sorted order, found by binary search"""
+        keys = self.sorted_keys()
+        return keys[bisect_left(keys, begin):bisect_right(keys, end)]
 
 class Index:
     """
@@ -10,7 +63,7 @@ class Index:
         # Dictionary of dictionaries: {column_index: {value: rid}}
         self.indices = [None] * table.num_columns
         # Initialize index for key column
-        self.indices[table.key] = {}
+        self.indices[table.key] = ColumnIndex()
         self._debug_log(f"Created index for table {table.name}, key column: {table.key}")
         
     @classmethod
@@ -24,17 +77,16 @@ class Index:
             col = int(col_str)
             if col < len(index.indices):
                 # Convert string keys back to integers for the index
-                index.indices[col] = {
-                    int(k): int(v) for k, v in index_dict.items()
-                }
+                index.indices[col] = ColumnIndex(zip(map(int, index_dict), map(int, index_dict.values())))
         return index
         
     def to_metadata(self):
         """
-        Convert index state to serializable format
+        Convert index state to serializable format. Integer keys are kept as they are;
+        the metadata writer turns them into strings while encoding.
         """
         return {
-            str(i): {str(k): v for k, v in (index_dict or {}).items()}
+            i: index_dict
             for i, index_dict in enumerate(self.indices)
             if index_dict is not None
         }
@@ -46,55 +98,31 @@ class Index:
 
     def locate(self, column, value):
         """Locate the RID associated with the given value in the specified column"""
-        if self.indices[column] is None:
+        index_dict = self.indices[column]
+        if index_dict is None:
             return None
             
-        rid = self.indices[column].get(value)
+        rid = index_dict.get(value)
         if rid is not None:
-            # Verify the record still exists and has the correct key
-            record = self.table.get_record(rid)
-            if record and record.columns[column] == value:
+            # Verify the record still exists and has the correct key; only the indexed column is read
+            if self.table.read_value(rid, column) == value:
                 return rid
             else:
                 # If key doesn't match, remove invalid index entry
-                self.indices[column].pop(value, None)
+                index_dict.pop(value, None)
                 return None
                 
         return None
         
     def locate_range(self, begin, end, column):
         """Returns a sorted list of RIDs of records within the given range"""
-        self._debug_log(f"START locate_range({begin}, {end}, {column})", 1)
-        self._debug_log(f"Index state for column {column}: {self.indices[column]}", 2)
-        
-        if self.indices[column] is None:
-            self._debug_log("No index exists for this column", 1)
+        index_dict = self.indices[column]
+        if index_dict is None:
+            self._debug_log("No index exists for this column")
             return []
             
-        # Track all operations for debugging
-        matching_pairs = []
-        excluded_pairs = []
-        
-        for key, rid in self.indices[column].items():
-            if begin <= key <= end:
-                matching_pairs.append((key, rid))
-                self._debug_log(f"Including key {key} (RID {rid})", 2)
-            else:
-                excluded_pairs.append((key, rid))
-                self._debug_log(f"Excluding key {key} (RID {rid})", 3)
-                
-        # Sort pairs and log the sorting process
-        self._debug_log(f"Pre-sort pairs: {matching_pairs}", 2)
-        sorted_pairs = sorted(matching_pairs, key=lambda x: x[0])
-        self._debug_log(f"Post-sort pairs: {sorted_pairs}", 2)
-        
-        # Extract RIDs
-        matching_rids = [pair[1] for pair in sorted_pairs]
-        
-        self._debug_log(f"Final RIDs: {matching_rids}", 1)
-        self._debug_log(f"Total matches: {len(matching_rids)}", 1)
-        
-        return matching_rids
+        # The keys inside the range are found by binary search; their RIDs are looked up afterwards
+        return [index_dict[key] for key in index_dict.keys_in_range(begin, end)]
 
     def create_index(self, column):
         """Create index for the specified column"""
@@ -102,16 +130,33 @@ class Index:
             self._debug_log(f"Invalid column index: {column}")
             return False
             
-        self.indices[column] = {}
         # Build index from existing records
-        for rid in self.table.page_directory:
-            record = self.table.get_record(rid)
-            if record and column < len(record.columns):
-                self.indices[column][record.columns[column]] = rid
+        rids, live = self._scan_base_rids()
+        self.indices[column] = self._build_column_index(column, rids, live)
                 
         self._debug_log(f"Built index for column {column} with {len(self.indices[column])} entries")
         return True
         
+    def _scan_base_rids(self):
+        """
+        Returns every base RID in slot order, with a parallel list of whether each record is
+        live. A slot is live only if the page directory maps its RID to that very slot.
+        """
+        table = self.table
+        page_directory = table.page_directory
+        rids = table.read_base_column(1)  # RID column
+        counts = page_directory.slot_counts('base', len(table.base_page_ids[1]))
+        locations = (('base', page_index, slot) for page_index, count in enumerate(counts) for slot in range(count))
+        return rids, [page_directory.get(rid) == location for rid, location in zip(rids, locations)]
+
+    def _build_column_index(self, column, rids, live):
+        """
+        Builds {value: rid} for a column from one scan of its base pages. Base pages hold
+        the latest values, so no records are fetched and no version chains are walked.
+        """
+        values = self.table.column_snapshot(column)
+        return ColumnIndex({value: rid for rid, value, is_live in zip(rids, values, live) if is_live})
+        
     def drop_index(self, column_number):
         """Drops the index for the specified column"""
         if column_number >= self.table.num_columns:
@@ -144,18 +189,11 @@ class Index:
         Rebuilds all indices from the table data.
         Useful when loading from disk or after massive changes.
         """
-        # Reset all indices except primary key
+        # The key column is always indexed; other indexed columns stay indexed
+        columns = [i for i, index in enumerate(self.indices) if index is not None or i == self.table.key]
         self.indices = [None] * self.table.num_columns
-        self.indices[self.table.key] = {}
         
-        # Rebuild from page directory
-        for rid in self.table.page_directory:
-            record = self.table.get_record(rid)
-            if record and record.columns:
-                # Always index the primary key
-                self.indices[self.table.key][record.columns[self.table.key]] = rid
-                
-                # Update other active indices
-                for i, index in enumerate(self.indices):
-                    if index is not None and i != self.table.key:
-                        index[record.columns[i]] = rid
\ No newline at end of file
+        # Scan the RID column once and share it between every rebuilt column
+        rids, live = self._scan_base_rids()
+        for column in columns:
+            self.indices[column] = self._build_column_index(column, rids, live)
@@ -6,16 +6,16 @@ class LockType(Enum):
     SHARED = 0      # Read lock
     EXCLUSIVE = 1   # Write lock
 
-class Lock:
-    def __init__(self, transaction_id, lock_type):
-        self.transaction_id = transaction_id
-        self.lock_type = lock_type
-        self.timestamp = threading.get_ident()
+LOCK_STRIPES = 64  # Record locks are split across this many independently locked stripes
 
 class LockManager:
     def __init__(self):
-        self._lock = threading.Lock()
-        self.record_locks = {}  # {rid: [Lock objects]}
+        # RIDs hash to a stripe; each stripe has its own mutex and lock tables, so
+        # transactions working on different records don't serialize on one mutex
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.shared_locks = [{} for _ in range(LOCK_STRIPES)]  # Per stripe: {rid: set(transaction_id)}
+        self.exclusive_locks = [{} for _ in range(LOCK_STRIPES)]  # Per stripe: {rid: transaction_id}
+        self._transactions_lock = threading.Lock()  # Guards transaction_locks only
         self.transaction_locks = {}  # {transaction_id: set(rid)}
         self.debug = False
 
@@ -24,67 +24,113 @@ class LockManager:
             #print(f"LOCK_MANAGER: {message}")
             pass
 
+    def _stripe(self, rid):
+        return hash(rid) % LOCK_STRIPES
+
     def acquire_lock(self, transaction_id, rid, lock_type):
         """
         Attempts to acquire a lock for a transaction.
         No-wait implementation - if lock cannot be acquired, raises LockConflictError.
         """
-        with self._lock:
-            self._debug_log(f"Transaction {transaction_id} attempting to acquire {lock_type} lock on rid {rid}")
+        stripe = self._stripe(rid)
+        shared_locks = self.shared_locks[stripe]
+        exclusive_locks = self.exclusive_locks[stripe]
+        with self._stripes[stripe]:
+            if self.debug:
+                self._debug_log(f"Transaction {transaction_id} attempting to acquire {lock_type} lock on rid {rid}")
 
-            if rid not in self.record_locks:
-                self.record_locks[rid] = []
-            if transaction_id not in self.transaction_locks:
-                self.transaction_locks[transaction_id] = set()
+            # Any other transaction's exclusive lock conflicts; an exclusive request also conflicts with other readers
+            holder = exclusive_locks.get(rid)
+            if holder is None and lock_type == LockType.EXCLUSIVE:
+                readers = shared_locks.get(rid)
+                if readers:
+                    holder = next((reader for reader in readers if reader != transaction_id), None)
+            if holder is not None and holder != transaction_id:
+                error_msg = f"Cannot acquire {lock_type} lock on rid {rid} - conflicting lock held by transaction {holder}"
+                if self.debug:
+                    self._debug_log(f"Lock conflict: {error_msg}")
+                raise LockConflictError(error_msg)
 
-            for lock in self.record_locks[rid]:
-                if lock.transaction_id != transaction_id:
-                    if lock.lock_type == LockType.EXCLUSIVE or lock_type == LockType.EXCLUSIVE:
-                        error_msg = f"Cannot acquire {lock_type} lock on rid {rid} - conflicting lock held by transaction {lock.transaction_id}"
-                        self._debug_log(f"Lock conflict: {error_msg}")
-                        raise LockConflictError(error_msg)
+            if lock_type == LockType.EXCLUSIVE:
+                # Takes the lock, or upgrades this transaction's own shared lock
+                exclusive_locks[rid] = transaction_id
+            else:
+                readers = shared_locks.get(rid)
+                if readers is None:
+                    shared_locks[rid] = readers = set()
+                readers.add(transaction_id)
 
-            new_lock = Lock(transaction_id, lock_type)
-            self.record_locks[rid].append(new_lock)
-            self.transaction_locks[transaction_id].add(rid)
+        with self._transactions_lock:
+            # Look up the transaction's set once; setdefault would build a throwaway set every call
+            rids = self.transaction_locks.get(transaction_id)
+            if rids is None:
+                self.transaction_locks[transaction_id] = rids = set()
+            rids.add(rid)
 
+        if self.debug:
             self._debug_log(f"Lock acquired: Transaction {transaction_id} got {lock_type} lock on rid {rid}")
-            return True
+        return True
+
+    def _drop_locks(self, stripe, transaction_id, rid):
+        """Drops the transaction's locks on rid. Caller must hold the rid's stripe lock."""
+        shared_locks = self.shared_locks[stripe]
+        readers = shared_locks.get(rid)
+        if readers is not None:
+            readers.discard(transaction_id)
+            if not readers:
+                del shared_locks[rid]
+        exclusive_locks = self.exclusive_locks[stripe]
+        if exclusive_locks.get(rid) == transaction_id:
+            del exclusive_locks[rid]
+
+    def _release(self, transaction_id, rid):
+        """Drops the transaction's locks on rid under the rid's stripe"""
+        stripe = self._stripe(rid)
+        with self._stripes[stripe]:
+            self._drop_locks(stripe, transaction_id, rid)
 
     def release_lock(self, transaction_id, rid):
         """Releases a specific lock held by a transaction"""
-        with self._lock:
+        if self.debug:
             self._debug_log(f"Releasing lock on rid {rid} for transaction {transaction_id}")
-            
-            if rid in self.record_locks:
-                self.record_locks[rid] = [lock for lock in self.record_locks[rid] 
-                                        if lock.transaction_id != transaction_id]
-                if not self.record_locks[rid]:
-                    del self.record_locks[rid]
-
-            if transaction_id in self.transaction_locks:
-                self.transaction_locks[transaction_id].discard(rid)
-                if not self.transaction_locks[transaction_id]:
+        
+        self._release(transaction_id, rid)
+
+        with self._transactions_lock:
+            rids = self.transaction_locks.get(transaction_id)
+            if rids is not None:
+                rids.discard(rid)
+                if not rids:
                     del self.transaction_locks[transaction_id]
 
     def release_all_locks(self, transaction_id):
         """Releases all locks held by a transaction"""
-        with self._lock:
+        if self.debug:
             self._debug_log(f"Releasing all locks for transaction {transaction_id}")
-            if transaction_id in self.transaction_locks:
-                rids_to_release = list(self.transaction_locks[transaction_id])
-                for rid in rids_to_release:
-                    self.release_lock(transaction_id, rid)
+        with self._transactions_lock:
+            rids = self.transaction_locks.pop(transaction_id, ())
+        # Group the rids by stripe so each stripe is locked once; stripes are taken
+        # one at a time, never while holding the transaction table lock
+        rids_by_stripe = {}
+        for rid in rids:
+            rids_by_stripe.setdefault(self._stripe(rid), []).append(rid)
+        for stripe, stripe_rids in rids_by_stripe.items():
+            with self._stripes[stripe]:
+                for rid in stripe_rids:
+                    self._drop_locks(stripe, transaction_id, rid)
 
     def has_lock(self, transaction_id, rid, lock_type=None):
-        """Checks if a transaction has a specific type of lock on a record"""
-        with self._lock:
-            if rid in self.record_locks:
-                for lock in self.record_locks[rid]:
-                    if lock.transaction_id == transaction_id:
-                        if lock_type is None or lock.lock_type == lock_type:
-                            return True
-            return False
+        """
+        Checks if a transaction has a specific type of lock on a record. Reads without
+        taking the stripe lock: each check is a single dict get or set membership test,
+        which the GIL makes atomic, so the answer is at worst momentarily stale.
+        """
+        stripe = self._stripe(rid)
+        if lock_type != LockType.SHARED and self.exclusive_locks[stripe].get(rid) == transaction_id:
+            return True
+        if lock_type != LockType.EXCLUSIVE and transaction_id in self.shared_locks[stripe].get(rid, ()):
+            return True
+        return False
 
     def get_transaction_locks(self, transaction_id):
         """Returns all rids locked by a transaction"""
@@ -92,6 +138,15 @@ class LockManager:
 
     def clear_all(self):
         """Clears all locks (used for testing and recovery)"""
-        with self._lock:
-            self.record_locks.clear()
-            self.transaction_locks.clear()
\ No newline at end of file
+        # Stripes are always taken in index order
+        for stripe_lock in self._stripes:
+            stripe_lock.acquire()
+        try:
+            for stripe in range(LOCK_STRIPES):
+                self.shared_locks[stripe].clear()
+                self.exclusive_locks[stripe].clear()
+            with self._transactions_lock:
+                self.transaction_locks.clear()
+        finally:
+            for stripe_lock in self._stripes:
+                stripe_lock.release()
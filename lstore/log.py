@@ -0,0 +1,34 @@
+import atexit
+import queue
+import sys
+import threading
+
+# Log lines are written to stdout by a background thread, so transactions never block on stdout.
+# The thread is started by the first log() call and joined when the interpreter exits
+_log_queue = queue.SimpleQueue()
+_STOP = object()  # Queued at exit; the log thread returns once it reaches it
+_log_thread = None
+_log_thread_guard = threading.Lock()  # Guards starting _log_thread
+
+def _write_log():
+    while True:
+        message = _log_queue.get()
+        if message is _STOP:
+            return
+        sys.stdout.write(message + "\n")
+
+def _stop_log():
+    """Waits for the log thread to write out every message queued before exit"""
+    _log_queue.put(_STOP)
+    _log_thread.join()
+
+def log(message):
+    """Queues a line for the log thread, starting the thread on first use"""
+    global _log_thread
+    if _log_thread is None:
+        with _log_thread_guard:
+            if _log_thread is None:
+                _log_thread = threading.Thread(target=_write_log, name="lstore-log", daemon=True)
+                _log_thread.start()
+                atexit.register(_stop_log)
+    _log_queue.put(message)
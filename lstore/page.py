@@ -1,7 +1,11 @@
+import struct
+
+_SLOT = struct.Struct('>q')  # One big-endian 8-byte signed integer per slot
+
 class Page:
-    def __init__(self):
+    def __init__(self, data=None):
         self.num_records = 0
-        self.data = bytearray(4096)  # 4KB page size
+        self.data = data if data is not None else bytearray(4096)  # 4KB page size
         
     def has_capacity(self):
         return self.num_records < 512  # 4096/8 = 512 (64-bit integers)
@@ -30,24 +34,25 @@ class Page:
             self.num_records += 1
             
         try:
-            # Ensure value is within valid range for 8-byte signed integer
-            if not (-9223372036854775808 <= int(value) <= 9223372036854775807):
-                return False
-                
-            self.data[offset:offset + 8] = int(value).to_bytes(8, 'big', signed=True)
+            # Packs in place; values outside the 8-byte signed range raise struct.error
+            _SLOT.pack_into(self.data, offset, int(value))
             return True
             
-        except (OverflowError, ValueError) as e:
+        except (struct.error, OverflowError, ValueError) as e:
             return False
         
+    def read_all(self, count=None):
+        """Returns every written value (or the first count of them) in slot order, unpacked in one call"""
+        count = self.num_records if count is None else min(count, self.num_records)
+        return list(struct.unpack_from(f'>{count}q', self.data))
+        
     def read(self, index):
         if index >= self.num_records:
             return None
             
         try:
-            offset = index * 8
-            value = int.from_bytes(self.data[offset:offset + 8], 'big', signed=True)
-            return value
+            # Unpacks straight from the buffer without slicing out a copy
+            return _SLOT.unpack_from(self.data, index * 8)[0]
             
         except Exception as e:
             return None
\ No newline at end of file
@@ -1,6 +1,7 @@
 from lstore.table import Table, Record
 from lstore.index import Index
 from time import time
+import traceback
 
 # Define metadata column indices
 INDIRECTION_COLUMN = 0
@@ -8,6 +9,9 @@ RID_COLUMN = 1
 TIMESTAMP_COLUMN = 2
 SCHEMA_ENCODING_COLUMN = 3
 
+# Returned by version_cache.get for a rid with no entry; None is a valid cached result
+_MISS = object()
+
 class Query:
     """
     Handles all query operations on the table including insertions, deletions,
@@ -19,6 +23,8 @@ class Query:
         self._table = table  # Use private attribute
         self.verify_table_state()
         self.debug = False
+        self._projections = {}  # {projection mask: positions of the included columns, or None when all are}
+        self._schema_positions = {}  # {schema encoding: positions of the columns it marks as updated}
         
     @property
     def table(self):
@@ -48,6 +54,26 @@ class Query:
             #    f.flush()
             pass
         
+    def _projected_positions(self, projected_columns_index):
+        """Returns the positions a projection mask selects, worked out once per distinct mask"""
+        mask = tuple(projected_columns_index)
+        try:
+            return self._projections[mask]
+        except KeyError:
+            positions = tuple(i for i, include in enumerate(mask) if include)
+            if len(positions) == len(mask):
+                positions = None  # Every column: callers just copy the row
+            self._projections[mask] = positions
+            return positions
+        
+    def _updated_positions(self, schema_encoding):
+        """Returns the column positions whose bits are set in a schema encoding, decoded once per distinct encoding"""
+        positions = self._schema_positions.get(schema_encoding)
+        if positions is None:
+            positions = tuple(i for i in range(self.table.num_columns) if schema_encoding & (1 << i))
+            self._schema_positions[schema_encoding] = positions
+        return positions
+        
     def delete(self, primary_key):
         """Delete record with given primary key."""
         # Locate record using index
@@ -56,19 +82,23 @@ class Query:
             return False
             
         # Get record location from page directory
-        if rid not in self.table.page_directory:
+        page_directory = self.table.page_directory
+        page_info = page_directory.get(rid)
+        if page_info is None:
             return False
             
-        page_type, page_index, record_index = self.table.page_directory[rid]
+        page_type, page_index, record_index = page_info
         if page_type != 'base':
             return False  # Can only delete base records
             
         # Mark record as deleted in page directory
-        self.table.page_directory[rid] = ('deleted', page_index, record_index)
+        page_directory[rid] = ('deleted', page_index, record_index)
+        self.table.invalidate_versions(rid)
         
         # Remove from index
-        if self.table.key < len(self.table.index.indices) and self.table.index.indices[self.table.key]:
-            self.table.index.indices[self.table.key].pop(primary_key, None)
+        key_index = self.table.index.indices[self.table.key]
+        if key_index:
+            key_index.pop(primary_key, None)
             
         return True
         
@@ -87,35 +117,65 @@ class Query:
         try:
             record = self.table.create_record(*columns)
             if record:
-                self._debug_log(f"Successfully inserted record with columns: {columns}")
+                if self.debug:
+                    self._debug_log(f"Successfully inserted record with columns: {columns}")
                 return True
             self._debug_log("Failed to create record")
             return False
             
         except Exception as e:
             self._debug_log(f"ERROR: Exception in insert: {str(e)}")
-            import traceback
-            self._debug_log(f"Traceback: {traceback.format_exc()}")
+            if self.debug:
+                self._debug_log(f"Traceback: {traceback.format_exc()}")
+            return False
+
+    def insert_many(self, rows):
+        """Insert many records at once: rows are appended page by page and the key index is updated in a single pass"""
+        self._debug_log(f"\n=== BULK INSERT OPERATION ===")
+        
+        if not self.table:
+            self._debug_log("ERROR: No table associated with query")
             return False
+            
+        num_columns = self.table.num_columns
+        rows = list(rows)
+        for columns in rows:
+            if len(columns) != num_columns:
+                self._debug_log(f"ERROR: Column count mismatch. Expected {num_columns}, got {len(columns)}")
+                return False
+                
+        records = self.table.create_records(rows)
+        
+        # Index whatever made it to the pages, even on a partial failure
+        key_index = self.table.index.indices[self.table.key]
+        if key_index is not None:
+            key_index.update({record.key: record.rid for record in records})
+            
+        if len(records) != len(rows):
+            self._debug_log("Failed to create record")
+            return False
+        if self.debug:
+            self._debug_log(f"Successfully inserted {len(records)} records")
+        return True
 
     def select(self, key, column, query_columns):
         """Returns Record(rid, key, columns) if found"""
         try:
-            if self.table.index.indices[self.table.key] is None:
+            # Resolve the table and key index once; reading the record verifies the index entry,
+            # so the index is read directly rather than through Index.locate
+            table = self.table
+            key_index = table.index.indices[table.key]
+            if key_index is None:
                 return False
             
-            rid = self.table.index.locate(self.table.key, key)
+            rid = key_index.get(key)
             if rid is None:
                 return False
             
-            record = self.table.get_record(rid)
-            if not record:
-                return False
-            
-            # Double check key matches
-            if record.key != key:
+            record = table.get_record(rid)
+            if not record or record.key != key:
                 # Remove invalid index entry
-                self.table.index.indices[self.table.key].pop(key, None)
+                key_index.pop(key, None)
                 return False
             
             return [record]
@@ -125,65 +185,161 @@ class Query:
     
     def select_version(self, key, key_index, projected_columns_index, relative_version):
         """Select a specific version of a record"""
+        return self.select_versions(key, key_index, projected_columns_index, [relative_version])[:1]
+
+    def select_versions(self, key, key_index, projected_columns_index, relative_versions):
+        """
+        Select several versions of one record, returning one Record per requested version.
+        The index lookup, base record read and version chain walk are shared between them.
+        """
         try:
             rid = self.table.index.locate(key_index, key)
             if rid is None:
-                return [Record(None, key, [None] * sum(projected_columns_index))]
+                return [Record(None, key, [None] * sum(projected_columns_index)) for _ in relative_versions]
+
+            # Serve the call from the table's select cache when every requested version is in it
+            mask = tuple(projected_columns_index)
+            cached_versions = self.table.select_cache.get(rid)
+            if cached_versions is not None:
+                hits = [cached_versions.get((relative_version, mask)) for relative_version in relative_versions]
+                if None not in hits:
+                    return [Record(rid, key, list(columns)) for columns in hits]
 
+            token = self.table.version_token(rid)
             base_record = self.table.get_record(rid)
             if not base_record:
-                return [Record(None, key, [None] * sum(projected_columns_index))]
+                return [Record(None, key, [None] * sum(projected_columns_index)) for _ in relative_versions]
 
-            # For version 0, return current record
-            if relative_version == 0:
-                projected_columns = [base_record.columns[i] for i, include in enumerate(projected_columns_index) if include]
-                return [Record(base_record.rid, key, projected_columns)]
-
-            # Build version chain, keeping only unique records with matching key
-            chain = []
-            current = base_record
-            visited = set()
+            positions = self._projected_positions(mask)
             
-            while current and current.indirection and current.indirection != current.rid:
-                if current.indirection in visited:
-                    break
-                visited.add(current.indirection)
-                next_record = self.table.get_record(current.indirection)
-                if not next_record:
-                    break
-                    
-                # Only keep records with matching key (original values)
-                if next_record.columns[0] == key:
-                    chain.append(next_record)
-                current = next_record
-
-            # Start with base record values
-            result_columns = list(base_record.columns)
+            # Every older version resolves against the same chain record, so walk it at most once
+            original_record = None
+            chain_walked = False
+            base_returned = False
+            versions = []
             
-            # If we found matching records in chain, use the first one's values
-            # (since tail records store original values)
-            if chain:
-                original_record = chain[0]
-                # Copy values from columns that were updated (based on schema)
-                schema = original_record.schema_encoding
-                for i in range(len(result_columns)):
-                    if schema & (1 << i):
-                        result_columns[i] = original_record.columns[i]
-
-            projected_columns = [result_columns[i] for i, include in enumerate(projected_columns_index) if include]
-            return [Record(base_record.rid, key, projected_columns)]
+            base_columns = base_record.columns
+            for relative_version in relative_versions:
+                if relative_version != 0 and not chain_walked:
+                    original_record = self._find_original_record(base_record, key, token)
+                    chain_walked = True
+                    
+                if relative_version == 0 and positions is None and not base_returned:
+                    # The freshly read base record already is the full newest version
+                    versions.append(base_record)
+                    base_returned = True
+                    continue
+                    
+                if relative_version == 0 or not original_record:
+                    # For version 0 (or a record never updated), use the current record
+                    if positions is None:
+                        projected_columns = list(base_columns)
+                    else:
+                        projected_columns = [base_columns[i] for i in positions]
+                        
+                # If we found a matching record in the chain, use its values for the columns
+                # its schema marks as updated (since tail records store original values).
+                # The merge and the projection happen in one pass over the output columns
+                elif positions is None:
+                    projected_columns = list(base_columns)
+                    original_columns = original_record.columns
+                    for i in self._updated_positions(original_record.schema_encoding):
+                        projected_columns[i] = original_columns[i]
+                else:
+                    original_columns = original_record.columns
+                    schema = original_record.schema_encoding
+                    projected_columns = [
+                        original_columns[i] if schema & (1 << i) else base_columns[i]
+                        for i in positions
+                    ]
+                versions.append(Record(base_record.rid, key, projected_columns))
+                
+            # Cached as tuples, so callers changing the returned lists can't alter the cache
+            self.table.cache_selected_versions(rid, token, {
+                (relative_version, mask): tuple(version.columns)
+                for relative_version, version in zip(relative_versions, versions)
+            })
+            return versions
 
         except Exception as e:
             print(f"Error in select_version: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
-            return [Record(None, key, [None] * sum(projected_columns_index))]
+            # The full stack is only worth walking and printing when debugging
+            if self.debug:
+                print(traceback.format_exc())
+            return [Record(None, key, [None] * sum(projected_columns_index)) for _ in relative_versions]
+
+    def _find_original_record(self, base_record, key, token):
+        """
+        Walk the version chain (newest first) until the first record with a matching
+        key; only that record's values are used, so stop there. The result is cached
+        on the table until the record is next updated, unless it was updated after
+        token (from Table.version_token) was taken, before base_record was read.
+        """
+        table = self.table
+        rid = base_record.rid
+        # One get rather than a membership test and a read, so an invalidation in between can't raise
+        original_record = table.version_cache.get(rid, _MISS)
+        if original_record is not _MISS:
+            return original_record
+        original_record = self._walk_version_chain(base_record, key)
+        table.cache_original_record(rid, token, original_record)
+        return original_record
+
+    def _walk_version_chain(self, base_record, key):
+        """Returns the newest record in the version chain whose key matches, or None"""
+        get_record = self.table.get_record
+        current = base_record
+        # A chain can't be longer than the directory, so counting steps guards against
+        # a cycle without keeping a visited set (the walk usually ends at the first tail)
+        steps_left = len(self.table.page_directory)
+        
+        while current and current.indirection and current.indirection != current.rid:
+            if steps_left == 0:
+                break
+            steps_left -= 1
+            next_record = get_record(current.indirection)
+            if not next_record:
+                break
+                
+            # Only records with matching key hold original values
+            if next_record.columns[0] == key:
+                return next_record
+            current = next_record
+            
+        return None
+
+    def _resolve_older_values(self, keys, rids, values, column):
+        """
+        Replaces, in place, each base value of a column with its value in the record's
+        original version, for records whose chain shows the column was updated. Chain
+        walks come from the table's version cache, so base records are only read on a miss.
+        """
+        table = self.table
+        version_cache = table.version_cache
+        bit = 1 << column
+        for position, (key, rid) in enumerate(zip(keys, rids)):
+            if values[position] is None:
+                continue
+            original_record = version_cache.get(rid, _MISS)
+            if original_record is _MISS:
+                token = table.version_token(rid)
+                base_record = table.get_record(rid)
+                if not base_record:
+                    values[position] = None
+                    continue
+                original_record = self._find_original_record(base_record, key, token)
+            if original_record and original_record.schema_encoding & bit:
+                values[position] = original_record.columns[column]
 
     def _decode_schema(self, schema_encoding):
         """Convert schema encoding to list of booleans indicating which columns were updated"""
         if isinstance(schema_encoding, str):
             return [bit == '1' for bit in schema_encoding]
-        return [(schema_encoding & (1 << i)) != 0 for i in range(self.table.num_columns)]
+        # Integer encodings reuse the positions decoded once per distinct encoding
+        decoded = [False] * self.table.num_columns
+        for i in self._updated_positions(schema_encoding):
+            decoded[i] = True
+        return decoded
 
     def locate(self, column, value):
         """Returns the RID of the record with the given value in the given column"""
@@ -209,39 +365,32 @@ class Query:
 
     def _project_record_to_list(self, record, projected_columns_index):
         """Helper method to project record columns"""
-        projected_values = []
-        for i, include in enumerate(projected_columns_index):
-            if include:
-                projected_values.append(record.columns[i])
-        return [Record(record.rid, record.key, projected_values)]
+        return [self._project_record(record, projected_columns_index)]
             
     def update(self, primary_key, *columns):
         """Update with verbose logging"""
-        self._debug_log(f"\n=== UPDATE OPERATION ===")
-        self._debug_log(f"Primary Key: {primary_key}")
-        self._debug_log(f"Update columns: {columns}")
+        if self.debug:
+            self._debug_log(f"\n=== UPDATE OPERATION ===")
+            self._debug_log(f"Primary Key: {primary_key}")
+            self._debug_log(f"Update columns: {columns}")
         
-        # First verify the record exists with correct key
-        rid = self.table.index.locate(self.table.key, primary_key)
+        # Look the record up once; the same RID and record are used for the whole update.
+        # Reading the record verifies the index entry, so the index is read directly
+        table = self.table
+        key_index = table.index.indices[table.key]
+        rid = key_index.get(primary_key) if key_index is not None else None
         if rid is None:
             self._debug_log("ERROR: Record not found in index")
             return False
         
-        record = self.table.get_record(rid)
-        if record is None or record.key != primary_key:
+        current_record = table.get_record(rid)
+        if current_record is None or current_record.key != primary_key:
             # Remove invalid index entry
-            self.table.index.indices[self.table.key].pop(primary_key, None)
+            key_index.pop(primary_key, None)
             self._debug_log("ERROR: Record not found or key mismatch")
             return False
-        
-        # Get current record
-        current_record = self.select(primary_key, self.table.key, [1] * self.table.num_columns)
-        if not current_record:
-            self._debug_log("ERROR: Record not found")
-            return False
-            
-        current_record = current_record[0]
-        self._debug_log(f"Current record: {current_record.columns}")
+        if self.debug:
+            self._debug_log(f"Current record: {current_record.columns}")
         
         # Create new column values
         new_columns = list(current_record.columns)
@@ -250,35 +399,34 @@ class Query:
         # Log each column update
         for i, value in enumerate(columns):
             if value is not None:
-                self._debug_log(f"Updating column {i}: {new_columns[i]} -> {value}")
+                if self.debug:
+                    self._debug_log(f"Updating column {i}: {new_columns[i]} -> {value}")
                 new_columns[i] = value
                 schema_encoding |= (1 << i)
                     
-            self._debug_log(f"New columns: {new_columns}")
-            self._debug_log(f"Schema encoding: {bin(schema_encoding)}")
+            if self.debug:
+                self._debug_log(f"New columns: {new_columns}")
+                self._debug_log(f"Schema encoding: {bin(schema_encoding)}")
         
         # Update record
-        rid = self.table.index.locate(self.table.key, primary_key)
-        if rid is None:
-            self._debug_log("ERROR: RID not found in index")
-            return False
+        success = table.update_record(rid, schema_encoding, *new_columns)
+        if self.debug:
+            self._debug_log(f"Update {'successful' if success else 'failed'}")
             
-        success = self.table.update_record(rid, schema_encoding, *new_columns)
-        self._debug_log(f"Update {'successful' if success else 'failed'}")
-        
-        # Verify update
-        updated_record = self.select(primary_key, self.table.key, [1] * self.table.num_columns)
-        if updated_record:
-            self._debug_log(f"Verification record: {updated_record[0].columns}")
-        else:
-            self._debug_log("ERROR: Could not verify update")
+            # Verify update
+            updated_record = self.select(primary_key, self.table.key, [1] * self.table.num_columns)
+            if updated_record:
+                self._debug_log(f"Verification record: {updated_record[0].columns}")
+            else:
+                self._debug_log("ERROR: Could not verify update")
             
         return success
             
     def sum(self, start_range, end_range, aggregate_column_index):
-        """Calculate sum with enhanced debugging and proper update handling"""
-        self._debug_log(f"\n=== SUM OPERATION START ===", 1)
-        self._debug_log(f"Parameters: range=[{start_range}, {end_range}], column={aggregate_column_index}", 1)
+        """Calculate sum over a key range. Base pages hold the latest values, so only the aggregated column is read."""
+        if self.debug:
+            self._debug_log(f"\n=== SUM OPERATION START ===", 1)
+            self._debug_log(f"Parameters: range=[{start_range}, {end_range}], column={aggregate_column_index}", 1)
         
         try:
             # Input validation
@@ -286,59 +434,25 @@ class Query:
                 self._debug_log("ERROR: Invalid column index", 1)
                 return False
                 
-            # Get all records in range with detailed tracking
-            records_info = {}  # Use dictionary to ensure uniqueness by key
-            running_total = 0
-            skipped_records = []
-            
-            # Get matching RIDs from index
+            # Get matching RIDs from index; the index maps each key to one RID, so there are no duplicates
             rids = self.table.index.locate_range(start_range, end_range, self.table.key)
-            self._debug_log(f"Found {len(rids)} RIDs in range", 1)
+            values = self.table.read_values(rids, aggregate_column_index)
             
-            # Process each RID
-            for rid in rids:
-                # Get record
-                record = self.table.get_record(rid)
-                if not record:
-                    skipped_records.append(rid)
-                    self._debug_log(f"WARNING: Could not retrieve record for RID {rid}", 1)
-                    continue
-                    
-                # Skip if we've already seen this key (meaning this is an older version)
-                if record.key in records_info:
-                    self._debug_log(f"Skipping duplicate key {record.key} (RID {rid})", 2)
-                    continue
-                    
-                value = record.columns[aggregate_column_index]
-                records_info[record.key] = {
-                    'rid': rid,
-                    'value': value,
-                    'all_columns': record.columns
-                }
-                running_total += value
-                
-                self._debug_log(f"Record {rid}:", 2)
-                self._debug_log(f"  Key: {record.key}", 2)
-                self._debug_log(f"  Value: {value}", 2)
-                self._debug_log(f"  Running total: {running_total}", 2)
-                    
-            # Summary information
-            self._debug_log("\n=== SUM OPERATION SUMMARY ===", 1)
-            self._debug_log(f"Total records processed: {len(records_info)}", 1)
-            self._debug_log(f"Records skipped: {len(skipped_records)}", 1)
-            self._debug_log(f"Final sum: {running_total}", 1)
+            # RIDs that could not be read (deleted or missing) are skipped
+            running_total = sum(value for value in values if value is not None)
             
-            # Detailed record list
-            self._debug_log("\n=== DETAILED RECORD LIST ===", 3)
-            for key, info in sorted(records_info.items()):
-                self._debug_log(f"RID {info['rid']}: key={key}, value={info['value']}", 3)
+            if self.debug:
+                self._debug_log("\n=== SUM OPERATION SUMMARY ===", 1)
+                self._debug_log(f"Found {len(rids)} RIDs in range", 1)
+                self._debug_log(f"Records skipped: {values.count(None)}", 1)
+                self._debug_log(f"Final sum: {running_total}", 1)
                 
             return running_total
             
         except Exception as e:
             self._debug_log(f"ERROR: Exception in sum operation: {str(e)}", 1)
-            import traceback
-            self._debug_log(f"Traceback: {traceback.format_exc()}", 1)
+            if self.debug:
+                self._debug_log(f"Traceback: {traceback.format_exc()}", 1)
             return False
                 
             
@@ -349,57 +463,51 @@ class Query:
             if aggregate_column_index >= self.table.num_columns:
                 return 0
                 
-            running_sum = 0
-            
-            # Instead of using locate_range, iterate through the index directly
             index_dict = self.table.index.indices[self.table.key]
             if not index_dict:
                 return 0
             
-            # Get all keys in range
-            for key in sorted(index_dict.keys()):
-                if start_range <= key <= end_range:
-                    rid = index_dict[key]
-                    base_record = self.table.get_record(rid)
-                    if not base_record:
-                        continue
-                    
-                    # Get correct version of the record
-                    versioned_record = self.select_version(
-                        key,
-                        self.table.key,
-                        [1] * self.table.num_columns,
-                        relative_version
-                    )
-                    
-                    if versioned_record and len(versioned_record) > 0 and versioned_record[0].rid is not None:
-                        running_sum += versioned_record[0].columns[aggregate_column_index]
-                    
-            return running_sum
+            # Only the keys in range are visited, found by binary search over the sorted keys
+            keys = index_dict.keys_in_range(start_range, end_range)
+            
+            # The newest version is what the base pages hold, so the column is read directly
+            rids = [index_dict[key] for key in keys]
+            values = self.table.read_values(rids, aggregate_column_index)
+            if relative_version != 0:
+                self._resolve_older_values(keys, rids, values, aggregate_column_index)
+                
+            # Keys whose record could not be resolved come back as None and are skipped
+            return sum(value for value in values if value is not None)
             
         except Exception as e:
             print(f"Error in sum_version: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            if self.debug:
+                print(traceback.format_exc())
             return 0
         
     def increment(self, key, column):
         """Increment value in specified column for record with given key."""
-        r = self.select(key, self.table.key, [1] * self.table.num_columns)[0]
-        if r is not False:
-            updated_columns = [None] * self.table.num_columns
-            updated_columns[column] = r.columns[column] + 1
-            u = self.update(key, *updated_columns)
-            return u
-        return False
+        # One lookup (which verifies the key) and one cell read, then straight to the table.
+        # Base pages only take the columns that are set, so the others are left as None
+        table = self.table
+        rid = table.index.locate(table.key, key)
+        if rid is None:
+            return False
+        value = table.read_value(rid, column)
+        if value is None:
+            return False
+            
+        new_columns = [None] * table.num_columns
+        new_columns[column] = value + 1
+        return table.update_record(rid, 1 << column, *new_columns)
         
     def _project_record(self, record, projected_columns_index):
         """Helper method to project specific columns from a record."""
-        projected_columns = []
-        for i, include in enumerate(projected_columns_index):
-            if include:
-                projected_columns.append(record.columns[i])
-        return Record(record.rid, record.key, projected_columns)
+        positions = self._projected_positions(projected_columns_index)
+        columns = record.columns
+        if positions is None:
+            return Record(record.rid, record.key, list(columns))
+        return Record(record.rid, record.key, [columns[i] for i in positions])
     
     def _verify_record(self, record, expected_values):
         """Helper method to verify record values"""
@@ -428,13 +536,13 @@ class Query:
         key_index = self.table.key
         index_dict = self.table.index.indices[key_index]
 
-        for key in sorted(index_dict.keys()):
-            if start_range <= key <= end_range:
-                rid = index_dict[key]
-                record = self.table.get_record(rid)
-                if record:
-                    keys.append(key)
-                    values.append(record.columns[aggregate_column_index])
+        # Only the keys inside the range are visited, as in Index.locate_range
+        for key in index_dict.keys_in_range(start_range, end_range):
+            rid = index_dict[key]
+            record = self.table.get_record(rid)
+            if record:
+                keys.append(key)
+                values.append(record.columns[aggregate_column_index])
                     
         self._debug_log(f"Keys used in calculation: {keys}")
         self._debug_log(f"Values used in calculation: {values}")
@@ -1,7 +1,10 @@
-from lstore.index import Index
+from lstore.index import Index, ColumnIndex
 from lstore.lock_manager import LockType
 from lstore.transaction_exceptions import *
-from time import time
+from time import time, time_ns
+from itertools import count, compress
+from array import array
+from collections import OrderedDict
 import threading
 import json
 
@@ -11,6 +14,8 @@ TIMESTAMP_COLUMN = 2
 SCHEMA_ENCODING_COLUMN = 3
 
 class Record:
+    __slots__ = ('rid', 'key', 'columns', 'indirection', 'timestamp', 'schema_encoding')
+    
     def __init__(self, rid, key, columns):
         self.rid = rid
         self.key = key
@@ -22,6 +27,128 @@ class Record:
     def __str__(self):
         return f"[{', '.join(map(str, self.columns))}]"
 
+PAGE_TYPES = ('base', 'tail', 'deleted', 'merged')
+_PAGE_TYPE_CODES = {page_type: code for code, page_type in enumerate(PAGE_TYPES)}
+_ABSENT = -1
+
+class PageDirectory:
+    """
+    Maps rid -> (page type, page index, slot) like a dict, but stores the entries as
+    three parallel arrays indexed by RID: a one-byte page type code and two 4-byte ints,
+    rather than a dict slot, a tuple and two int objects per record.
+    """
+    __slots__ = ('_types', '_pages', '_slots', '_len')
+
+    def __init__(self, entries=()):
+        self._types = array('b')
+        self._pages = array('i')
+        self._slots = array('i')
+        self._len = 0
+        for rid, entry in entries:
+            self[rid] = entry
+
+    def _grow(self, rid):
+        """Extends the arrays to hold rid, at least doubling them so appends stay amortized O(1)"""
+        extra = max(rid + 1, 2 * len(self._types)) - len(self._types)
+        self._types.extend(array('b', [_ABSENT]) * extra)
+        self._pages.extend(array('i', [0]) * extra)
+        self._slots.extend(array('i', [0]) * extra)
+
+    def __setitem__(self, rid, entry):
+        page_type, page_index, slot = entry
+        if rid >= len(self._types):
+            self._grow(rid)
+        code = _PAGE_TYPE_CODES[page_type]
+        if self._types[rid] == _ABSENT:
+            self._len += 1
+        self._pages[rid] = page_index
+        self._slots[rid] = slot
+        self._types[rid] = code  # Written last, as it's what marks the entry present
+
+    def get(self, rid, default=None):
+        if rid < 0 or rid >= len(self._types):
+            return default
+        code = self._types[rid]
+        if code == _ABSENT:
+            return default
+        return (PAGE_TYPES[code], self._pages[rid], self._slots[rid])
+
+    def __getitem__(self, rid):
+        entry = self.get(rid)
+        if entry is None:
+            raise KeyError(rid)
+        return entry
+
+    def __contains__(self, rid):
+        return 0 <= rid < len(self._types) and self._types[rid] != _ABSENT
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return (rid for rid, code in enumerate(self._types) if code != _ABSENT)
+
+    def items(self):
+        return ((rid, self[rid]) for rid in self)
+
+    def rids_of_type(self, page_type):
+        """Returns every RID whose entry has the given page type, in RID order"""
+        code = _PAGE_TYPE_CODES[page_type]
+        return list(compress(range(len(self._types)), (t == code for t in self._types)))
+
+    def slot_counts(self, page_type, num_pages):
+        """
+        Returns, for each of num_pages page sets of the given type, one past the highest slot
+        an entry of that type (or a deleted one, which keeps its slot) maps to
+        """
+        codes = {_PAGE_TYPE_CODES[page_type], _PAGE_TYPE_CODES['deleted']} if page_type == 'base' else {_PAGE_TYPE_CODES[page_type]}
+        counts = [0] * num_pages
+        for code, page_index, slot in zip(self._types, self._pages, self._slots):
+            if code in codes and page_index < num_pages and slot >= counts[page_index]:
+                counts[page_index] = slot + 1
+        return counts
+
+    def to_metadata(self):
+        """Returns the entries as a plain {rid: (page type, page index, slot)} dict for the metadata file"""
+        return dict(self.items())
+
+class LRUCache:
+    """
+    A dict-like cache holding at most maxsize entries; storing one more evicts
+    the least recently used. Safe to use from several threads.
+    """
+    __slots__ = ('maxsize', '_entries', '_lock')
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
 class Table:
     _lock = threading.Lock()
 
@@ -29,12 +156,11 @@ class Table:
         self.name = name
         self.key = key
         self.num_columns = num_columns
-        self.page_directory = {}
+        self.page_directory = PageDirectory()
         self.bufferpool = bufferpool
         self.lock_manager = lock_manager
         self.total_columns = num_columns + 4
-        self._next_rid_lock = threading.Lock()
-        self._next_rid = 0
+        self._next_rid = count()  # next() on a count is atomic under the GIL, so no lock is needed
         
         # Only initialize index if specified (not when loading from disk)
         if initialize_index:
@@ -44,6 +170,26 @@ class Table:
         
         self.num_records = 0
         self.num_updates = 0
+        # {base rid: record its version chain resolves older versions to}; an entry is dropped when its record is updated
+        self.version_cache = {}
+        # Stamp from _cache_epochs per base rid, taken each time its cached versions are dropped, and
+        # one for dropping them all. A result is only cached if its rid's stamps are unchanged since
+        # the read that produced it began; _cache_lock makes that check and the store one step
+        self._cache_epochs = count(1)
+        self._version_epochs = {}
+        self._cache_epoch = 0
+        self._cache_lock = threading.Lock()
+        # {base rid: {(relative version, projection mask): projected columns}} for the 1024 most
+        # recently selected records; dropped with version_cache
+        self.select_cache = LRUCache(maxsize=1024)
+        # {page_id: Page} and {(is_base, page_index): [Page per column]} for pages this
+        # table has read, valid until the bufferpool next evicts
+        self._page_handles = {}
+        self._row_handles = {}
+        self._free_base_page = 0  # No base page set before this one has room
+        self._base_row_ids = (-1, None)  # (base page index, page ID per column) of the last page set inserted into
+        self.page_range_size = 512  # Match Page class capacity
+        self._page_handles_evictions = bufferpool.evictions if bufferpool else 0
         
         # Initialize page IDs lists
         self.base_page_ids = []
@@ -67,17 +213,15 @@ class Table:
             pass
 
     def _get_next_rid(self):
-        with self._next_rid_lock:
-            rid = self._next_rid
-            self._next_rid += 1
-            #print(f"DEBUG: Generated new RID {rid} for table {self.name}")
-            return rid
+        return next(self._next_rid)
         
     @classmethod
     def from_metadata(cls, name, num_columns, key, bufferpool, metadata, lock_manager):
         """Create a table instance from metadata"""
         table = cls(name, num_columns, key, bufferpool, lock_manager, initialize_index=False)
-        table.page_directory = {int(k): tuple(v) for k, v in metadata['page_directory'].items()}
+        # JSON object keys come back as strings
+        page_directory = metadata['page_directory']
+        table.page_directory = PageDirectory(zip(map(int, page_directory), page_directory.values()))
         table.num_records = metadata['num_records']
         table.num_updates = metadata.get('num_updates', 0)
         table.base_page_ids = metadata['base_page_ids']
@@ -88,9 +232,7 @@ class Table:
             for col_str, index_dict in metadata['index_data'].items():
                 col = int(col_str)
                 if col < len(table.index.indices):
-                    table.index.indices[col] = {
-                        int(k): int(v) for k, v in index_dict.items()
-                    }
+                    table.index.indices[col] = ColumnIndex(zip(map(int, index_dict), map(int, index_dict.values())))
         
         return table
     
@@ -100,46 +242,19 @@ class Table:
             key_value = columns[self.key]
             #print(f"DEBUG: Creating record - RID: {rid}, Key: {key_value}")
             
-            # Define page range size if not already defined
-            if not hasattr(self, 'page_range_size'):
-                self.page_range_size = 512  # Match Page class capacity
-            
-            # Find first page with capacity
-            current_base_page_idx = 0
-            while current_base_page_idx < len(self.base_page_ids[0]):
-                if all(self.bufferpool.get_page(self.name, self.base_page_ids[col][current_base_page_idx]).has_capacity() 
-                    for col in range(self.total_columns)):
-                    break
-                current_base_page_idx += 1
-            
-            # Create new page if needed
-            if current_base_page_idx >= len(self.base_page_ids[0]):
-                for col in range(self.total_columns):
-                    new_page_id = f"{self.name}_base_{col}_{len(self.base_page_ids[col])}"
-                    self.base_page_ids[col].append(new_page_id)
+            current_base_page_idx = self._base_page_with_capacity()
+            page_ids = self._base_row_page_ids(current_base_page_idx)
             
             # Get actual slot within the page
-            slot = self.bufferpool.get_num_records(self.name, self.base_page_ids[0][current_base_page_idx])
+            slot = self.bufferpool.get_num_records(self.name, page_ids[0])
             
             # Update bufferpool's page directory with the page location
-            page_id = self.base_page_ids[0][current_base_page_idx]
-            self.bufferpool.page_directory[rid] = page_id
-            
-            # Write metadata columns
-            self.bufferpool.write_to_page(self.name, self.base_page_ids[INDIRECTION_COLUMN][current_base_page_idx], rid)
-            self.bufferpool.write_to_page(self.name, self.base_page_ids[RID_COLUMN][current_base_page_idx], rid)
-            self.bufferpool.write_to_page(self.name, self.base_page_ids[TIMESTAMP_COLUMN][current_base_page_idx], int(time() * 1000000))
-            self.bufferpool.write_to_page(self.name, self.base_page_ids[SCHEMA_ENCODING_COLUMN][current_base_page_idx], 0)
+            self.bufferpool.page_directory[rid] = page_ids[0]
             
-            # Write data columns
-            for i, value in enumerate(columns):
-                success = self.bufferpool.write_to_page(
-                    self.name, 
-                    self.base_page_ids[i + 4][current_base_page_idx], 
-                    value
-                )
-                if not success:
-                    return None
+            # Write metadata columns, then data columns, as one row
+            timestamp = time_ns() // 1000
+            if not self.bufferpool.write_row(self.name, page_ids, (rid, rid, timestamp, 0, *columns)):
+                return None
             
             # Update page directory with correct slot
             self.page_directory[rid] = ('base', current_base_page_idx, slot)
@@ -147,7 +262,7 @@ class Table:
             # Create and return record object
             record = Record(rid, columns[self.key], list(columns))
             record.indirection = rid
-            record.timestamp = int(time() * 1000000)
+            record.timestamp = timestamp
             record.schema_encoding = 0
             
             # Update index AFTER successful write
@@ -163,12 +278,215 @@ class Table:
             print(f"ERROR in create_record: {str(e)}")
             return None
 
+    def _base_page_with_capacity(self, start=0):
+        """Returns the index of the first base page set (from start) with room in every column, adding one if none has"""
+        # Base slots are never freed, so no page set before the last one found can have room again
+        current_base_page_idx = max(start, self._free_base_page)
+        while current_base_page_idx < len(self.base_page_ids[0]):
+            # Rows are written column 0 first, so no page in the set is fuller than column 0's
+            if self._get_page(True, INDIRECTION_COLUMN, current_base_page_idx).has_capacity():
+                break
+            current_base_page_idx += 1
+        
+        # Create new page if needed
+        if current_base_page_idx >= len(self.base_page_ids[0]):
+            for col in range(self.total_columns):
+                new_page_id = f"{self.name}_base_{col}_{len(self.base_page_ids[col])}"
+                self.base_page_ids[col].append(new_page_id)
+        self._free_base_page = current_base_page_idx
+        return current_base_page_idx
+    
+    def _base_row_page_ids(self, page_index):
+        """Returns the page ID of every column for one base page set, rebuilt only when the page set changes"""
+        cached_index, page_ids = self._base_row_ids
+        if cached_index != page_index:
+            page_ids = [column_page_ids[page_index] for column_page_ids in self.base_page_ids]
+            self._base_row_ids = (page_index, page_ids)
+        return page_ids
+    
+    def create_records(self, rows):
+        """
+        Appends many records to the base pages and returns the created records. Each
+        page set is fetched once and filled with as many rows as it holds, and its pages
+        are marked dirty once. Does not touch the index; callers index the returned
+        records themselves. Stops at the first row that cannot be written.
+        """
+        records = []
+        bufferpool = self.bufferpool
+        page_directory = self.page_directory
+        rows = iter(rows)
+        page_idx = -1
+        
+        try:
+            while True:
+                page_idx = self._base_page_with_capacity(page_idx + 1)
+                page_ids = self._base_row_page_ids(page_idx)
+                pages = [bufferpool.get_page(self.name, page_id) for page_id in page_ids]
+                first_page = pages[0]
+                
+                try:
+                    while first_page.has_capacity():
+                        columns = next(rows, None)
+                        if columns is None:
+                            return records
+                            
+                        rid = self._get_next_rid()
+                        slot = first_page.num_records
+                        timestamp = time_ns() // 1000
+                        bufferpool.page_directory[rid] = page_ids[0]
+                        
+                        # Metadata columns, then data columns
+                        for page, value in zip(pages, (rid, rid, timestamp, 0, *columns)):
+                            if not page.write(value):
+                                return records
+                                
+                        page_directory[rid] = ('base', page_idx, slot)
+                        record = Record(rid, columns[self.key], list(columns))
+                        record.indirection = rid
+                        record.timestamp = timestamp
+                        record.schema_encoding = 0
+                        records.append(record)
+                        self.num_records += 1
+                finally:
+                    for page_id in page_ids:
+                        bufferpool.mark_dirty(self.name, page_id)
+                    
+        except Exception as e:
+            print(f"ERROR in create_records: {str(e)}")
+            return records
+
     def _get_page(self, is_base, column, page_index):
         """Helper method to get a page from the buffer pool"""
         page_ids = self.base_page_ids if is_base else self.tail_page_ids
         if column < 0 or column >= len(page_ids) or page_index < 0 or page_index >= len(page_ids[column]):
             return None
-        return self.bufferpool.get_page(self.name, page_ids[column][page_index])
+        page_id = page_ids[column][page_index]
+        
+        # Pages are looked up in the table's own handle cache first
+        self._check_page_handles()
+        page = self._page_handles.get(page_id)
+        if page is None:
+            page = self._page_handles[page_id] = self.bufferpool.get_page(self.name, page_id)
+        return page
+    
+    def _row_pages(self, is_base, page_index):
+        """Returns the pages of every column (metadata first) for one page set, or None if it doesn't exist"""
+        self._check_page_handles()
+        pages = self._row_handles.get((is_base, page_index))
+        if pages is None:
+            page_ids = self.base_page_ids if is_base else self.tail_page_ids
+            if page_index < 0 or page_index >= len(page_ids[0]):
+                return None
+            pages = [self._get_page(is_base, column, page_index) for column in range(self.total_columns)]
+            self._row_handles[(is_base, page_index)] = pages
+        return pages
+    
+    def _check_page_handles(self):
+        """Drops the cached page handles if the bufferpool has evicted since they were taken, since an evicted page is reloaded as a new Page the handles would miss"""
+        evictions = self.bufferpool.evictions
+        if self._page_handles_evictions != evictions:
+            self._page_handles.clear()
+            self._row_handles.clear()
+            self._page_handles_evictions = evictions
+    
+    def read_base_column(self, page_column):
+        """
+        Returns every value stored in one physical base column (metadata columns included), in
+        slot order. Each page is read only up to the slots the page directory maps: a page
+        loaded from disk counts all of its slots as written, including unused ones.
+        """
+        page_ids = self.base_page_ids[page_column]
+        values = []
+        for page_id, count in zip(page_ids, self.page_directory.slot_counts('base', len(page_ids))):
+            values.extend(self.bufferpool.get_page(self.name, page_id).read_all(count))
+        return values
+    
+    def column_snapshot(self, column):
+        """
+        Returns the current value of a data column for every base record, in slot order.
+        Base pages hold the latest values, so no version chains are walked. Deleted
+        records are not filtered out.
+        """
+        return self.read_base_column(column + 4)
+    
+    def version_token(self, rid):
+        """Returns a token that changes whenever the cached versions of a base record are dropped"""
+        return self._cache_epoch, self._version_epochs.get(rid)
+    
+    def cache_original_record(self, rid, token, original_record):
+        """Caches a version chain walk, unless the record's versions were dropped since token was taken"""
+        with self._cache_lock:
+            if token == self.version_token(rid):
+                self.version_cache[rid] = original_record
+    
+    def cache_selected_versions(self, rid, token, versions):
+        """
+        Adds {(relative version, projection mask): projected columns} to a record's select
+        cache entry, unless the record's versions were dropped since token was taken
+        """
+        with self._cache_lock:
+            if token == self.version_token(rid):
+                cached_versions = self.select_cache.get(rid)
+                if cached_versions is None:
+                    self.select_cache[rid] = cached_versions = {}
+                cached_versions.update(versions)
+    
+    def invalidate_versions(self, rid=None):
+        """Drops the cached version chain and select results for a base record, or for every record when rid is None"""
+        with self._cache_lock:
+            if rid is None:
+                self._cache_epoch = next(self._cache_epochs)
+                self.version_cache.clear()
+                self.select_cache.clear()
+            else:
+                self._version_epochs[rid] = next(self._cache_epochs)
+                self.version_cache.pop(rid, None)
+                self.select_cache.pop(rid, None)
+    
+    def read_value(self, rid, column):
+        """Returns one data column of a record without reading the others, or None if the record is missing or deleted"""
+        page_info = self.page_directory.get(rid)
+        if page_info is None or page_info[0] == 'deleted':
+            return None
+        page_type, page_index, slot = page_info
+        page = self._get_page(page_type == 'base', column + 4, page_index)
+        return page.read(slot) if page is not None else None
+    
+    def read_values(self, rids, column):
+        """
+        Returns one data column for each RID, in order, with None for missing or deleted
+        records. Pages are fetched once per page rather than once per RID.
+        """
+        page_directory = self.page_directory
+        pages = {}  # {(is_base, page_index): Page}
+        values = []
+        for rid in rids:
+            page_info = page_directory.get(rid)
+            if page_info is None or page_info[0] == 'deleted':
+                values.append(None)
+                continue
+            page_type, page_index, slot = page_info
+            page_key = (page_type == 'base', page_index)
+            page = pages.get(page_key)
+            if page is None:
+                page = pages[page_key] = self._get_page(page_key[0], column + 4, page_index)
+            values.append(page.read(slot) if page is not None else None)
+        return values
+    
+    def _read_meta(self, rid):
+        """Returns (indirection, schema encoding, timestamp) of a record without reading its data columns, or None if it is missing or deleted"""
+        page_info = self.page_directory.get(rid)
+        if page_info is None or page_info[0] == 'deleted':
+            return None
+        page_type, page_index, slot = page_info
+        pages = self._row_pages(page_type == 'base', page_index)
+        if pages is None:
+            return None
+        return (
+            pages[INDIRECTION_COLUMN].read(slot),
+            pages[SCHEMA_ENCODING_COLUMN].read(slot),
+            pages[TIMESTAMP_COLUMN].read(slot),
+        )
     
     def get_record(self, rid, transaction_id=None):
         """Get record with proper locking"""
@@ -189,23 +507,16 @@ class Table:
             return None
             
         try:
-            is_base = page_type == 'base'
-            indirection = self._get_page(is_base, INDIRECTION_COLUMN, page_index).read(slot)
-            timestamp = self._get_page(is_base, TIMESTAMP_COLUMN, page_index).read(slot)
-            schema_encoding = self._get_page(is_base, SCHEMA_ENCODING_COLUMN, page_index).read(slot)
-            
-            values = []
-            for i in range(4, self.total_columns):
-                page = self._get_page(is_base, i, page_index)
-                value = page.read(slot)
-                if value is None:
-                    return None
-                values.append(value)
+            # The row's pages are resolved once per page set, then every column is read at the slot
+            row = [page.read(slot) for page in self._row_pages(page_type == 'base', page_index)]
+            values = row[4:]
+            if None in values:
+                return None
                 
             record = Record(rid, values[self.key], values)
-            record.indirection = indirection
-            record.timestamp = timestamp
-            record.schema_encoding = schema_encoding
+            record.indirection = row[INDIRECTION_COLUMN]
+            record.timestamp = row[TIMESTAMP_COLUMN]
+            record.schema_encoding = row[SCHEMA_ENCODING_COLUMN]
             
             return record
             
@@ -221,32 +532,37 @@ class Table:
                 if not self.lock_manager.acquire_lock(transaction_id, rid, LockType.EXCLUSIVE):
                     raise LockConflictError(f"Could not acquire exclusive lock on rid {rid}")
                     
-            if rid not in self.page_directory:
+            page_info = self.page_directory.get(rid)
+            if page_info is None or page_info[0] == 'deleted':
                 return False
                 
-            base_record = self.get_record(rid)
-            if not base_record:
+            # The tail record needs only the base record's indirection and the values being replaced
+            page_type, page_index, slot = page_info
+            pages = self._row_pages(page_type == 'base', page_index)
+            if pages is None:
+                return False
+            base_indirection = pages[INDIRECTION_COLUMN].read(slot)
+            base_columns = [page.read(slot) for page in pages[4:]]
+            if None in base_columns:
                 return False
 
             # Create tail record
             tail_rid = self.num_records + self.num_updates
-            timestamp = int(time() * 1000000)
+            timestamp = time_ns() // 1000
             
             # Handle tail pages
             current_tail_page_idx = len(self.tail_page_ids[0]) - 1
-            need_new_page = any(not self._get_page(False, col, current_tail_page_idx).has_capacity() 
-                              for col in range(self.total_columns))
-            
-            if need_new_page:
+            if not self._get_page(False, INDIRECTION_COLUMN, current_tail_page_idx).has_capacity():
                 for col in range(self.total_columns):
                     new_page_id = f"{self.name}_tail_{col}_{len(self.tail_page_ids[col])}"
                     self.tail_page_ids[col].append(new_page_id)
                 current_tail_page_idx = len(self.tail_page_ids[0]) - 1
 
             # Write tail record and update base record
-            self._write_tail_record(base_record, tail_rid, timestamp, schema_encoding, 
-                                  current_tail_page_idx, columns)
+            self._write_tail_record(rid, base_indirection, base_columns, tail_rid, timestamp, schema_encoding, 
+                                  current_tail_page_idx)
             self._update_base_record(rid, tail_rid, timestamp, schema_encoding, columns)
+            self.invalidate_versions(rid)
 
             self.num_updates += 1
             
@@ -261,28 +577,19 @@ class Table:
             self._debug_log(f"Error in update_record: {str(e)}", "ERROR")
             return False
 
-    def _write_tail_record(self, base_record, tail_rid, timestamp, schema_encoding, page_idx, new_columns):
+    def _write_tail_record(self, base_rid, base_indirection, base_columns, tail_rid, timestamp, schema_encoding, page_idx):
         """Helper to write tail record"""
-        # Store the current base record values (these are the values BEFORE the update)
-        current_values = list(base_record.columns)
-        
-        # Write the current values to the tail record
-        for i, value in enumerate(current_values):
-            self.bufferpool.write_to_page(self.name, self.tail_page_ids[i + 4][page_idx], value)
-
-        # Get current indirection from base record
-        base_indirection = base_record.indirection
-        
         # IMPORTANT: Tail record should point to the record that came before it
         # If this is the first update (base points to itself), point to base
         # Otherwise, point to where base was pointing (previous tail)
-        tail_indirection = base_record.rid if base_indirection == base_record.rid else base_indirection
+        tail_indirection = base_rid if base_indirection == base_rid else base_indirection
         
-        # Write metadata for tail record
-        self.bufferpool.write_to_page(self.name, self.tail_page_ids[INDIRECTION_COLUMN][page_idx], tail_indirection)
-        self.bufferpool.write_to_page(self.name, self.tail_page_ids[RID_COLUMN][page_idx], tail_rid)
-        self.bufferpool.write_to_page(self.name, self.tail_page_ids[TIMESTAMP_COLUMN][page_idx], timestamp)
-        self.bufferpool.write_to_page(self.name, self.tail_page_ids[SCHEMA_ENCODING_COLUMN][page_idx], schema_encoding)
+        # Write the metadata and the current base values (these are the values BEFORE the update) as one row
+        page_ids = [page_ids[page_idx] for page_ids in self.tail_page_ids]
+        self.bufferpool.write_row(
+            self.name, page_ids,
+            (tail_indirection, tail_rid, timestamp, schema_encoding, *base_columns)
+        )
         
         # Register in directory
         tail_slot = self.bufferpool.get_num_records(self.name, self.tail_page_ids[0][page_idx]) - 1
@@ -292,91 +599,44 @@ class Table:
         """Helper to update base record"""
         base_page_type, base_page_idx, base_slot = self.page_directory[base_rid]
         
-        # Update base record with new values
-        for i, value in enumerate(new_columns):
-            if value is not None:
-                self.bufferpool.write_to_page(
-                    self.name, 
-                    self.base_page_ids[i + 4][base_page_idx],
-                    value, 
-                    base_slot
-                )
-        
-        # IMPORTANT: Base record ALWAYS points to the newest tail record
-        self.bufferpool.write_to_page(
-            self.name,
+        # IMPORTANT: Base record ALWAYS points to the newest tail record. The metadata
+        # and the updated columns (those not None) are written in place as one row
+        page_ids = [
             self.base_page_ids[INDIRECTION_COLUMN][base_page_idx],
-            tail_rid,
-            base_slot
-        )
-        
-        # Update timestamp and schema
-        self.bufferpool.write_to_page(
-            self.name,
             self.base_page_ids[TIMESTAMP_COLUMN][base_page_idx],
-            timestamp,
-            base_slot
-        )
-        self.bufferpool.write_to_page(
-            self.name,
             self.base_page_ids[SCHEMA_ENCODING_COLUMN][base_page_idx],
-            schema_encoding,
-            base_slot
-        )
+        ]
+        values = [tail_rid, timestamp, schema_encoding]
+        for i, value in enumerate(new_columns):
+            if value is not None:
+                page_ids.append(self.base_page_ids[i + 4][base_page_idx])
+                values.append(value)
+        self.bufferpool.write_row(self.name, page_ids, values, base_slot)
 
     def __merge(self):
-        """Merge tail records into base records"""
+        """
+        Consolidates base record metadata. Base pages are updated in place and already hold
+        every record's latest values, while tail records keep the values each update
+        replaced, so no data is copied and each base record keeps pointing at its newest
+        tail record; the version chains stay intact. The schema encoding of each updated
+        base record is set to every column its chain has updated.
+        """
         try:
             self._debug_log("Starting merge operation")
+            page_directory = self.page_directory
+            schema_mask = (1 << self.num_columns) - 1
+            dirty_page_ids = set()
             
-            # Track records to merge
-            merge_candidates = {}  # {base_rid: [tail_rids]}
-            
-            # Build merge candidates list
-            for rid, (page_type, _, _) in self.page_directory.items():
-                if page_type == 'base':
-                    record = self.get_record(rid)
-                    if record and record.indirection != rid:
-                        merge_candidates[rid] = []
-                        current_rid = record.indirection
-                        while current_rid is not None:
-                            tail_record = self.get_record(current_rid)
-                            if not tail_record:
-                                break
-                            merge_candidates[rid].append(current_rid)
-                            current_rid = tail_record.indirection
-
-            # Process each base record
-            for base_rid, tail_rids in merge_candidates.items():
-                if not tail_rids:
+            for rid in page_directory.rids_of_type('base'):
+                final_schema = self._chain_schema(rid)
+                if final_schema is None:
                     continue
-                    
-                # Get the most recent values
-                base_record = self.get_record(base_rid)
-                final_values = list(base_record.columns)
-                final_schema = 0
+                _, page_index, slot = page_directory[rid]
+                self._get_page(True, SCHEMA_ENCODING_COLUMN, page_index).write(final_schema & schema_mask, slot)
+                dirty_page_ids.add(self.base_page_ids[SCHEMA_ENCODING_COLUMN][page_index])
                 
-                # Apply updates in reverse order
-                for tail_rid in reversed(tail_rids):
-                    tail_record = self.get_record(tail_rid)
-                    if not tail_record:
-                        continue
-                        
-                    # Update values based on schema
-                    schema = tail_record.schema_encoding
-                    for i, value in enumerate(tail_record.columns):
-                        if schema & (1 << i):
-                            final_values[i] = value
-                            final_schema |= (1 << i)
-
-                # Update base record with merged values
-                self._update_base_record(base_rid, base_rid, int(time() * 1000000), 
-                                      final_schema, final_values)
-                
-                # Mark tail records as merged
-                for tail_rid in tail_rids:
-                    if tail_rid in self.page_directory:
-                        self.page_directory[tail_rid] = ('merged', 0, 0)
+            for page_id in dirty_page_ids:
+                self.bufferpool.mark_dirty(self.name, page_id)
 
             self.last_merge_time = time()
             self._debug_log("Merge operation completed")
@@ -384,6 +644,27 @@ class Table:
         except Exception as e:
             self._debug_log(f"Error in merge operation: {str(e)}", "ERROR")
 
+    def _chain_schema(self, base_rid):
+        """
+        Returns the union of the schema encodings of the tail records in a base record's
+        version chain, or None if it has none, reading only the metadata columns. The chain
+        ends where it leads back to the base record or to a record that is no longer a tail.
+        """
+        page_directory = self.page_directory
+        _, page_index, slot = page_directory[base_rid]
+        current_rid = self._get_page(True, INDIRECTION_COLUMN, page_index).read(slot)
+        chain_schema = None
+        steps_left = len(page_directory)
+        while current_rid is not None and current_rid != base_rid and steps_left:
+            page_info = page_directory.get(current_rid)
+            if page_info is None or page_info[0] != 'tail':
+                break
+            _, page_index, slot = page_info
+            chain_schema = (chain_schema or 0) | self._get_page(False, SCHEMA_ENCODING_COLUMN, page_index).read(slot)
+            current_rid = self._get_page(False, INDIRECTION_COLUMN, page_index).read(slot)
+            steps_left -= 1
+        return chain_schema
+
     def rollback_record(self, rid, transaction_id):
         """Rollback changes made to a record"""
         try:
@@ -400,8 +681,9 @@ class Table:
                 return False
                 
             # Restore previous values
-            self._update_base_record(rid, rid, int(time() * 1000000), 
+            self._update_base_record(rid, rid, time_ns() // 1000, 
                                    prev_record.schema_encoding, prev_record.columns)
+            self.invalidate_versions(rid)
             return True
             
         except Exception as e:
@@ -421,16 +703,19 @@ class Table:
             if version == 0:  # Current version
                 return record
                 
-            # Navigate version chain
-            current = record
+            # Navigate version chain on the metadata columns alone, building a record only for the version returned
+            current_rid, indirection = rid, record.indirection
             version_count = 0
-            while current and current.indirection and current.indirection != current.rid:
+            while indirection and indirection != current_rid:
                 if version_count == abs(version):
-                    return current
-                current = self.get_record(current.indirection)
+                    break
+                meta = self._read_meta(indirection)
+                if meta is None:
+                    return None
+                current_rid, indirection = indirection, meta[0]
                 version_count += 1
                 
-            return current
+            return record if current_rid == rid else self.get_record(current_rid)
             
         except Exception as e:
             self._debug_log(f"Error in get_record_version: {str(e)}", "ERROR")
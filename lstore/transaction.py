@@ -1,28 +1,42 @@
 from lstore.table import Table, Record
 from lstore.index import Index
+from lstore.query import Query
 from lstore.lock_manager import LockType, LockManager
 from lstore.transaction_exceptions import *
+from lstore.log import log
 from enum import Enum
 from time import time
 from datetime import datetime
+from itertools import count
 
 class TransactionState(Enum):
     ACTIVE = 0
     COMMITTED = 1
     ABORTED = 2
 
+# Lock each query function takes on its key; anything not listed writes and takes an exclusive lock.
+# Keyed by the plain function, so a bound method is looked up through its __func__
+_LOCK_TYPE_FOR = {
+    Query.select: LockType.SHARED,
+}
+
 class Transaction:
-    _transaction_counter = 0  # Class variable to generate unique IDs
+    _transaction_counter = count(1)  # Class variable to generate unique IDs
+    __slots__ = ('transaction_id', 'lock_manager', 'queries', '_compiled_queries', '_query_types', '_applied', '_started', '_committed', '_aborted', 'results')
 
     def __init__(self, transaction_id=None, lock_manager=None):
         # Generate unique transaction ID if none provided
         if transaction_id is None:
-            Transaction._transaction_counter += 1
-            transaction_id = Transaction._transaction_counter
+            transaction_id = next(Transaction._transaction_counter)
             
         self.transaction_id = transaction_id
         self.lock_manager = lock_manager if lock_manager else LockManager()
         self.queries = []
+        self._compiled_queries = []  # (query_func, args) per query, ready to call
+        self._query_types = set()  # __name__ of every query function added
+        # Positions of writes that have taken effect. Writes aren't undone on abort, so a
+        # retry skips these instead of applying them twice; cleared on commit
+        self._applied = set()
         self._started = False
         self._committed = False
         self._aborted = False
@@ -30,7 +44,7 @@ class Transaction:
 
     def begin(self):
         if self._started:
-            print(f"DEBUG: Transaction {self.transaction_id} failed to begin - already started")
+            log(f"DEBUG: Transaction {self.transaction_id} failed to begin - already started")
             return False
         #print(f"DEBUG: Transaction {self.transaction_id} beginning with {len(self.queries)} queries")
         self._started = True
@@ -44,6 +58,7 @@ class Transaction:
             if self.lock_manager:
                 self.lock_manager.release_all_locks(self.transaction_id)
             self._committed = True
+            self._applied.clear()
             return True
         except Exception as e:
             self.abort()
@@ -64,51 +79,73 @@ class Transaction:
     def add_query(self, query_func, table, *args):
         """Add a query to this transaction"""
         self.queries.append((query_func, table, *args))
+        self._compiled_queries.append((query_func, args))
+        self._query_types.add(query_func.__name__)
         return True
 
     def execute(self):
         """Execute all queries in the transaction"""
         if not self.begin():
-            print(f"DEBUG: Transaction {self.transaction_id} failed at begin() stage")
+            log(f"DEBUG: Transaction {self.transaction_id} failed at begin() stage")
             return False
 
+        # A failed query ends the loop with its reason instead of raising through a second handler;
+        # the try only catches errors raised by the lock manager or a query function
+        error = None
+        failed_query = None
         try:
             #print(f"DEBUG: Transaction {self.transaction_id} starting execution of {len(self.queries)} queries")
-            for i, (query_func, table, *args) in enumerate(self.queries):
+            # Position of the last query on each key, so its lock is released right after that query
+            last_use = {args[0]: i for i, (_, args) in enumerate(self._compiled_queries)}
+            
+            for i, (query_func, args) in enumerate(self._compiled_queries):
                 #print(f"DEBUG: Transaction {self.transaction_id} - Query {i+1}/{len(self.queries)}")
                 #print(f"DEBUG: Function: {query_func.__name__}, Args: {args}")
+                failed_query = i
                 
                 # Get appropriate lock type
-                lock_type = LockType.SHARED if query_func.__name__ == 'select' else LockType.EXCLUSIVE
+                func = getattr(query_func, '__func__', query_func)
+                lock_type = _LOCK_TYPE_FOR.get(func, LockType.EXCLUSIVE)
                 
-                try:
-                    # Acquire lock with timeout
-                    if not self.lock_manager.acquire_lock(self.transaction_id, args[0], lock_type):
-                        print(f"DEBUG: Transaction {self.transaction_id} failed to acquire {lock_type} lock for {args[0]}")
-                        raise TransactionAbortError(f"Lock acquisition failed for {args[0]}")
-                        
-                    result = query_func(*args)
-                    #print(f"DEBUG: Query {i+1} successful in Transaction {self.transaction_id}")
-                    self.results.append(result)
-                    
-                    # Release lock if it's the last operation on this key
-                    next_queries = self.queries[i+1:]
-                    if not any(args[0] == next_args[0] for _, _, *next_args in next_queries):
-                        #print(f"DEBUG: Releasing lock for {args[0]} - no more operations on this key")
-                        self.lock_manager.release_lock(self.transaction_id, args[0])
+                # Acquire lock with timeout
+                if not self.lock_manager.acquire_lock(self.transaction_id, args[0], lock_type):
+                    error = f"Lock acquisition failed for {args[0]}"
+                    break
                     
-                except Exception as e:
-                    print(f"DEBUG: Query {i+1} failed in Transaction {self.transaction_id}: {str(e)}")
+                if i in self._applied:
+                    result = True  # Already applied by an earlier attempt
+                else:
+                    if func is Query.insert:
+                        self._check_insert(self.queries[i][1], args)
+                    result = query_func(*args)
+                    if result and lock_type is LockType.EXCLUSIVE:
+                        self._applied.add(i)
+                #print(f"DEBUG: Query {i+1} successful in Transaction {self.transaction_id}")
+                self.results.append(result)
+                
+                # Release lock if it's the last operation on this key
+                if last_use[args[0]] == i:
+                    #print(f"DEBUG: Releasing lock for {args[0]} - no more operations on this key")
                     self.lock_manager.release_lock(self.transaction_id, args[0])
-                    raise
-
+                    
+        except Exception as e:
+            error = e
+            
+        if error is None:
             #print(f"DEBUG: Transaction {self.transaction_id} committing.")
             return self.commit()
+            
+        # Aborting releases every lock still held, including the failed query's
+        log(f"DEBUG: Query {failed_query + 1} failed in Transaction {self.transaction_id}: {str(error)}")
+        self.abort()
+        if isinstance(error, UnrecoverableError):
+            raise error  # Passed on as is, so the worker doesn't retry it
+        raise TransactionAbortError(f"Transaction failed: {str(error)}")
 
-        except Exception as e:
-            print(f"DEBUG: Transaction {self.transaction_id} failed during execution: {str(e)}")
-            self.abort()
-            raise TransactionAbortError(f"Transaction failed: {str(e)}")
+    def _check_insert(self, table, columns):
+        """Raises UnrecoverableError if the insert can never succeed, however often it is retried"""
+        if len(columns) != table.num_columns:
+            raise UnrecoverableError(f"Insert has {len(columns)} columns, table '{table.name}' has {table.num_columns}")
 
     def get_queries(self):
         """Get all queries in this transaction"""
@@ -116,7 +153,7 @@ class Transaction:
 
     def has_query(self, query_type):
         """Check if transaction has a specific type of query"""
-        return any(q[0].__name__ == query_type for q in self.queries)
+        return query_type in self._query_types
 
     @property
     def is_running(self):
@@ -46,5 +46,11 @@ class InvalidTransactionStateError(TransactionException):
 class TransactionTimeoutError(TransactionException):
     """Raised when a transaction exceeds its time limit"""
     def __init__(self, message="Transaction timed out"):
+        self.message = message
+        super().__init__(self.message)
+
+class UnrecoverableError(TransactionException):
+    """Raised when a transaction fails in a way that retrying it cannot fix, such as a schema or key constraint violation"""
+    def __init__(self, message="Unrecoverable transaction error"):
         self.message = message
         super().__init__(self.message)
\ No newline at end of file
@@ -1,106 +1,131 @@
 from lstore.lock_manager import LockManager
-import uuid
+from lstore.log import log
 import threading
 import time
-from collections import defaultdict
+import random
+import queue
+from itertools import count
 from lstore.transaction_exceptions import *
 
+_worker_ids = count(1)
+
 class TransactionWorker(threading.Thread):
-    # Class-level lock for synchronizing table access
-    _global_table_lock = threading.Lock()
 
-    def __init__(self, lock_manager=None):
+    def __init__(self, lock_manager=None, transaction_queue=None):
         super().__init__()  # Initialize the Thread superclass
         self.lock_manager = lock_manager if lock_manager else LockManager()
-        self.id = str(uuid.uuid4())[:8]
-        self.transactions = []
+        self.id = next(_worker_ids)
+        # Transactions added to this worker, not yet run. A SimpleQueue, so add_transaction
+        # can be called from any thread, including while the worker is running
+        self.transactions = queue.SimpleQueue()
+        # Optional queue.SimpleQueue shared with other workers; idle workers keep
+        # pulling from it so no single worker is left holding a long tail
+        self.transaction_queue = transaction_queue
         self.MAX_RETRIES = 3
         self.RETRY_DELAY = 0.1
+        self.MAX_BACKOFF = 30.0  # Upper bound on a single retry's sleep, in seconds
+        # {transaction_id: state}
         self.transaction_states = {}
-        self._lock = threading.Lock()
-        self._started = threading.Event()
         self.stats = {
             'success': 0,
             'failed': 0
         }
 
-    def _execute_transaction(self, transaction, attempt):
-        """Execute a single transaction"""
-        try:
-            # Acquire global lock before starting transaction
-            with self._global_table_lock:
-                if not transaction.begin():
-                    self._log(f"Failed to begin transaction {transaction.transaction_id}")
-                    return False, None
-                
-                self.transaction_states[transaction.transaction_id] = 'RUNNING'
-                
-                # Execute each query within the global lock
-                for query_func, table, *args in transaction.queries:
-                    try:
-                        # Execute query (no need for individual locks since we have global lock)
-                        if not query_func(*args):
-                            raise QueryExecutionError("Query execution failed")
-                            
-                    except Exception as e:
-                        self._log(f"Query execution failed in transaction {transaction.transaction_id}: {str(e)}")
-                        transaction.abort()
-                        return False, f"Query execution failed in transaction {transaction.transaction_id}: {str(e)}"
-                        
-                # Commit transaction
-                if transaction.commit():
-                    self.transaction_states[transaction.transaction_id] = 'COMPLETED'
-                    return True, None
-                    
-                return False, None
-                
-        except Exception as e:
-            self._log(f"Transaction {transaction.transaction_id} failed: {str(e)}")
-            transaction.abort()
-            return False, f"Transaction {transaction.transaction_id} failed: {str(e)}"
-
     def add_transaction(self, transaction):
         """Add a transaction to this worker's queue"""
         if transaction.lock_manager is None:
             transaction.lock_manager = self.lock_manager
-        self.transactions.append(transaction)
+        self.transactions.put(transaction)
         self.transaction_states[transaction.transaction_id] = 'PENDING'
 
+    def execute_sync(self):
+        """Executes all transactions on the caller's thread and returns the number that succeeded"""
+        return self._run_impl()
+
+    def execute_async(self):
+        """Starts executing all transactions on the worker's own thread; join() waits for them"""
+        self.start()
+
     def run(self):
-        """Thread's run method - executes all transactions"""
-        # If the thread hasn't been started, start it properly
-        if not self._started.is_set():
-            self.start()
-            self.join()
-            return
+        """
+        Thread's run method - executes all transactions. Calling it directly rather than
+        through start() runs them on the caller's thread, like execute_sync.
+        """
+        return self._run_impl()
 
-        #print(f"Worker {id(self)} [INFO]: Starting with {len(self.transactions)} transactions")
-        for txn in self.transactions:
-            try:
-                # Reset transaction state if needed
-                txn._started = False
-                txn._committed = False
-                txn._aborted = False
+    def join(self, timeout=None):
+        """Waits for the worker's thread, returning at once if it was never started (the transactions ran synchronously)"""
+        if self.ident is not None:
+            super().join(timeout)
+
+    def _run_impl(self):
+        #print(f"Worker {id(self)} [INFO]: Starting with {self.transactions.qsize()} transactions")
+        # Transactions are taken one at a time, so the shared queue is never drained up front.
+        # Counts are kept in locals and added to self.stats once at the end
+        run_with_retries = self._run_with_retries
+        succeeded = failed = 0
+        for txn in self._pending_transactions():
+            if run_with_retries(txn):
+                succeeded += 1
+            else:
+                failed += 1
+        self.stats['success'] += succeeded
+        self.stats['failed'] += failed
                 
-                # Execute transaction
+        #print(f"Worker {id(self)} [INFO]: Worker finished. Success rate: {self.stats['success']}/{self.stats['success'] + self.stats['failed']}")
+        return self.stats['success']
+
+    def _run_with_retries(self, txn):
+        """
+        Executes a transaction, retrying it up to MAX_RETRIES times when it aborts. Each
+        retry sleeps a random time up to an exponentially growing bound (full jitter), so
+        workers that collided on a record don't collide again in lockstep. An
+        UnrecoverableError, or any other error, fails the transaction without retrying.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            # Reset transaction state if needed
+            txn._started = False
+            txn._committed = False
+            txn._aborted = False
+            txn.results = []
+            
+            try:
                 if txn.execute():
-                    self.stats['success'] += 1
-                else:
-                    self.stats['failed'] += 1
-                    print(f"Worker {id(self)} [INFO]: Transaction failed to execute")
-            except Exception as e:
-                self.stats['failed'] += 1
-                print(f"Worker {id(self)} [INFO]: Query execution failed in transaction {txn.transaction_id}: {str(e)}")
+                    return True
+                self._log("Transaction failed to execute")
+                return False
                 
-        #print(f"Worker {id(self)} [INFO]: Worker finished. Success rate: {self.stats['success']}/{len(self.transactions)}")
-        return self.stats['success']
+            except TransactionAbortError as e:
+                if attempt == self.MAX_RETRIES:
+                    self._log(f"Transaction {txn.transaction_id} aborted after {attempt + 1} attempts: {str(e)}")
+                    return False
+                time.sleep(random.uniform(0, min(self.MAX_BACKOFF, self.RETRY_DELAY * 2 ** attempt)))
+                
+            except UnrecoverableError as e:
+                self._log(f"Transaction {txn.transaction_id} failed and will not be retried: {str(e)}")
+                return False
+                
+            except Exception as e:
+                self._log(f"Query execution failed in transaction {txn.transaction_id}: {str(e)}")
+                return False
+
+    def _pending_transactions(self):
+        """Yields this worker's own transactions, then drains the shared queue"""
+        for transaction_queue in (self.transactions, self.transaction_queue):
+            if transaction_queue is None:
+                continue
+            while True:
+                try:
+                    yield transaction_queue.get_nowait()
+                except queue.Empty:
+                    break
 
     def start_and_join(self):
         """Helper method to start the thread and wait for it to finish"""
-        self.start()
+        self.execute_async()
         self.join()
         return True
 
     def _log(self, message):
-        """Log a message with the worker's ID"""
-        print(f"Worker {self.id} [INFO]: {message}")
\ No newline at end of file
+        """Log a message with the worker's ID; it is queued for the log thread rather than printed here"""
+        log(f"Worker {self.id} [INFO]: {message}")
\ No newline at end of file
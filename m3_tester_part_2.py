@@ -82,8 +82,6 @@ score = len(keys)
 for key in keys:
     try:
         correct = records[key]
-        query = Query(grades_table)
-        
         result = query.select(key, 0, [1, 1, 1, 1, 1])[0].columns
         if correct != result:
             print('select error on primary key', key, ':', result, ', correct:', correct)